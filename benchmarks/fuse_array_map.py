@@ -0,0 +1,64 @@
+"""Time exp(x) * y + z through standard_pipeline, with and without fusion.
+
+The expression makes three array_map calls, which fuse_array_map merges
+into one. With myia installed or in PYTHONPATH, run:
+
+    python benchmarks/fuse_array_map.py [size] [repeat]
+
+"""
+
+import sys
+import timeit
+
+import numpy
+
+from myia.api import standard_pipeline, step_opt
+from myia.dtype import Array, Float
+from myia.opt import lib as optlib
+from myia.prim import ops as P
+from myia.prim.py_implementations import array_map, scalar_exp
+from myia.utils import Override
+
+
+def f(x, y, z):
+    """Compute exp(x) * y + z elementwise."""
+    return array_map(scalar_exp, x) * y + z
+
+
+def build(fuse, shape):
+    """Compile f for arrays of the given shape.
+
+    Returns the compiled function and its number of array maps.
+    """
+    pip = standard_pipeline
+    if not fuse:
+        opts = [opt for opt in step_opt.keywords['opts']
+                if opt is not optlib.fuse_array_map]
+        pip = pip.configure({'opt.opts': Override(opts)})
+    spec = {'type': Array[Float[64]], 'shape': shape}
+    res = pip.make()(input=f, argspec=(spec, spec, spec))
+    maps = sum(node.inputs[0].value in (P.array_map, P.array_map_into)
+               for node in res['graph'].manager.all_nodes
+               if node.is_apply() and node.inputs[0].is_constant())
+    return res['output'], maps
+
+
+def main(size=200, repeat=20):
+    """Time f on size x size arrays, with and without fusion."""
+    shape = (size, size)
+    x, y, z = numpy.random.rand(3, *shape)
+    expected = numpy.exp(x) * y + z
+    times = {}
+    for fuse in (False, True):
+        fn, maps = build(fuse, shape)
+        assert numpy.allclose(fn(x, y, z), expected)
+        best = min(timeit.repeat(lambda: fn(x, y, z), number=1,
+                                 repeat=repeat))
+        times[fuse] = best
+        print(f'fuse_array_map={fuse!s:<5} {maps} array_map,'
+              f' best of {repeat}: {best * 1000:.3f} ms')
+    print(f'speedup: {times[False] / times[True]:.2f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -10,9 +10,10 @@ from .cconv import closure_convert
 from .dtype import Tuple, List, Class, Array, Int, Float, Bool, \
     Number, tag_to_dataclass, ismyiatype, type_to_np_dtype, TypeMeta
 from .infer import InferenceEngine, ANYTHING
-from .ir import Graph, clone, GraphManager
+from .ir import Graph, clone, GraphManager, manage
 from .opt import PatternEquilibriumOptimizer, lib as optlib, CSE, \
-    erase_class
+    ElimUnusedParameters, elim_unused_parameters, erase_class, \
+    HoistInvariants, MarkInplace
 from .pipeline import PipelineStep, PipelineResource, PipelineDefinition
 from .prim import py_implementations, vm_implementations, ops as P
 from .prim.value_inferrers import ValueTrack, value_inferrer_constructors
@@ -21,6 +22,7 @@ from .prim.shape_inferrers import ShapeTrack, shape_inferrer_constructors
 from .specialize import TypeSpecializer
 from .utils import TypeMap, as_frozen, overload
 from .vm import VM
+from .debug.profile import GraphProfiler
 from .compile import step_wrap_primitives, step_compile, step_link, step_export
 from .validate import validate, whitelist as default_whitelist
 
@@ -357,7 +359,8 @@ class Inferrer(PipelineStep):
         inferrer: The inference engine.
     """
 
-    def __init__(self, pipeline_init, tracks, required_tracks):
+    def __init__(self, pipeline_init, tracks, required_tracks,
+                 incremental=False):
         """Initialize an Inferrer."""
         super().__init__(pipeline_init)
         self.tracks = tracks
@@ -366,6 +369,7 @@ class Inferrer(PipelineStep):
             self.pipeline,
             tracks=self.tracks,
             required_tracks=self.required_tracks,
+            incremental=incremental,
         )
 
     def fill_in(self, argspec):
@@ -407,14 +411,25 @@ class Specializer(PipelineStep):
 
     Outputs:
         graph: The specialized graph.
+        specializer: The TypeSpecializer, which holds statistics about the
+            specializations.
     """
 
+    def __init__(self, pipeline_init, max_specializations=None,
+                 max_nodes=None):
+        """Initialize a Specializer."""
+        super().__init__(pipeline_init)
+        self.max_specializations = max_specializations
+        self.max_nodes = max_nodes
+
     def step(self, graph, inferrer, inference_context):
         """Specialize the graph according to argument types."""
-        spc = TypeSpecializer(inferrer)
+        spc = TypeSpecializer(inferrer,
+                              max_specializations=self.max_specializations,
+                              max_nodes=self.max_nodes)
         result = spc.run(graph, inference_context)
         self.resources.manager.keep_roots(result)
-        return {'graph': result}
+        return {'graph': result, 'specializer': spc}
 
 
 class Preparator(PipelineStep):
@@ -475,6 +490,7 @@ class ClosureConverter(PipelineStep):
     def step(self, graph):
         """Closure convert the graph."""
         closure_convert(graph)
+        elim_unused_parameters(graph, manage(graph))
         return {'graph': graph}
 
 
@@ -483,22 +499,29 @@ class DebugVMExporter(PipelineStep):
 
     Inputs:
         graph: The graph to wrap into a callable.
+        specializer: The TypeSpecializer (optional).
 
     Outputs:
         output: The callable.
+        profiler: The GraphProfiler for the callable, if profile is True.
     """
 
-    def __init__(self, pipeline_init, implementations):
+    def __init__(self, pipeline_init, implementations, profile=False):
         """Initialize an DebugVMExporter."""
         super().__init__(pipeline_init)
         self.vm = VM(self.pipeline.resources.convert,
                      self.pipeline.resources.manager,
                      self.pipeline.resources.py_implementations,
                      implementations)
+        self.profile = profile
 
-    def step(self, graph):
+    def step(self, graph, specializer=None):
         """Make a Python callable out of the graph."""
-        return {'output': self.vm.export(graph)}
+        if not self.profile:
+            return {'output': self.vm.export(graph)}
+        self.vm.profiler = GraphProfiler(specializer and specializer.originals)
+        return {'output': self.vm.export(graph),
+                'profiler': self.vm.profiler}
 
 
 @overload
@@ -684,10 +707,14 @@ step_infer = Inferrer.partial(
         )
     ),
     required_tracks=['type'],
+    incremental=False,
 )
 
 
-step_specialize = Specializer.partial()
+step_specialize = Specializer.partial(
+    max_specializations=None,
+    max_nodes=None,
+)
 
 
 step_prepare = Preparator.partial(
@@ -701,11 +728,16 @@ step_opt = Optimizer.partial(
         optlib.simplify_always_true,
         optlib.simplify_always_false,
         optlib.inline_unique_uses,
+        optlib.inline_cost,
         optlib.simplify_partial,
         optlib.replace_applicator,
         optlib.elim_identity,
+        optlib.constant_fold,
+        optlib.constant_fold_shape,
+        optlib.elim_distribute,
+        optlib.fuse_array_map,
     ],
-    post=[CSE]
+    post=[CSE, ElimUnusedParameters, HoistInvariants, MarkInplace]
 )
 
 
@@ -732,6 +764,7 @@ _standard_pipeline = PipelineDefinition(
             object_map=standard_object_map,
             converter=default_convert
         ),
+        debug_info=None,
     ),
     steps=dict(
         parse=step_parse,
@@ -1,8 +1,9 @@
 """Linear implementation using the debug VM."""
 
+from .memory import plan_memory
 from .utils import get_outputs
 
-from ..ir import Graph, manage, clone
+from ..ir import Graph, Parameter, manage, clone
 from ..prim import Primitive, vm_implementations, ops as P
 from ..vm import VM
 
@@ -24,14 +25,24 @@ def debug_convert(lst):
 
     Notes:
         This implementation will convert the nodes into a subgraph
-        that will run using the debug VM to help testing.
+        that will run using the debug VM to help testing. The array
+        temporaries planned by `plan_memory` are written in views on a
+        buffer, using `array_map_into`. The buffer is allocated on each
+        call, so that the function can be re-entered or called from
+        several threads, and its results stay valid after other calls.
 
     """
     eqv = {}
     inputs = []
     outputs = []
+    uses = lst[0].graph.manager.uses
+
+    plan = plan_memory(lst, uses)
+    planned = [n for n in lst if n in plan.slots]
 
     g = Graph()
+    # The buffers are given after the inputs, once those are all known
+    buffers = {n: Parameter(g) for n in planned}
 
     def ref(n):
         if n.is_constant():
@@ -46,10 +57,14 @@ def debug_convert(lst):
         assert n.inputs[0].is_constant(Primitive)
         fn = n.inputs[0].value
         args = [ref(a) for a in n.inputs[1:]]
-        eqv[n] = g.apply(fn, *args)
+        if n in buffers:
+            eqv[n] = g.apply(P.array_map_into, buffers[n], *args)
+        else:
+            eqv[n] = g.apply(fn, *args)
 
-    outputs = get_outputs(lst, lst[0].graph.manager.uses, set(eqv.keys()))
+    outputs = get_outputs(lst, uses, set(eqv.keys()))
     g.output = g.apply(P.make_tuple, *[eqv[o] for o in outputs])
+    g.parameters.extend(buffers[n] for n in planned)
 
     # Clone in case g contains subgraphs that have a different manager
     g = clone(g)
@@ -60,5 +75,21 @@ def debug_convert(lst):
             implementations=vm_implementations)
 
     fn = vm.export(g)
+    if planned:
+        fn = _Segment(fn, plan, planned)
 
     return fn, inputs, outputs
+
+
+class _Segment:
+    """Call a segment with a new buffer for its temporaries."""
+
+    def __init__(self, closure, plan, planned):
+        self.graph = closure.graph
+        self.closure = closure
+        self.plan = plan
+        self.planned = planned
+
+    def __call__(self, *args):
+        views = self.plan.allocate()
+        return self.closure(*args, *(views[n] for n in self.planned))
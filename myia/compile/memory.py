@@ -0,0 +1,105 @@
+"""Static memory planning for the array temporaries of linear segments."""
+
+import numpy as np
+
+from ..dtype import Array, ismyiatype, type_to_np_dtype
+from ..opt import only_reads
+from ..prim import ops as P
+
+
+class MemoryPlan:
+    """Assignment of array temporaries to regions of a single buffer.
+
+    Attributes:
+        slots: Map each planned node to its (offset, nbytes, dtype, shape).
+        size: The size of the buffer in bytes, which is the peak memory
+            used by the planned temporaries.
+
+    """
+
+    def __init__(self, slots, size):
+        """Initialize a MemoryPlan."""
+        self.slots = slots
+        self.size = size
+
+    def allocate(self):
+        """Allocate the buffer and return a map from nodes to views on it."""
+        arena = np.empty(self.size, dtype=np.uint8)
+        return {node: arena[offset:offset + nbytes]
+                .view(dtype).reshape(shape)
+                for node, (offset, nbytes, dtype, shape)
+                in self.slots.items()}
+
+
+def _temporary(node, seen, uses):
+    # Return (dtype, shape) if node is an array temporary that can be
+    # planned, None otherwise.
+    if not (node.is_apply() and node.inputs[0].is_constant()
+            and node.inputs[0].value is P.array_map):
+        return None
+    t = node.type
+    shape = node.inferred['shape'] if 'shape' in node.inferred else None
+    if not ismyiatype(t, Array) \
+            or not isinstance(shape, tuple) \
+            or not all(isinstance(s, int) for s in shape):
+        return None
+    if not all(user in seen and only_reads(user, key)
+               for user, key in uses[node]):
+        return None
+    try:
+        return np.dtype(type_to_np_dtype(t.elements)), shape
+    except TypeError:
+        return None
+
+
+def plan_memory(lst, uses, alignment=64):
+    """Plan the memory of the array temporaries of a linear segment.
+
+    A temporary is the result of an `array_map` with a known type and
+    shape that is only read by other nodes of the segment, which never
+    return it or a view on it, so that it cannot escape the segment. Each
+    one is given a region of a buffer that is allocated for all of them
+    when the segment is run, and two temporaries can share memory if
+    every use of one must be computed before the other, whatever the
+    order in which the segment is executed.
+
+    Arguments:
+        lst: list of nodes (the segment)
+        uses: dict mapping each node to its uses (globally)
+        alignment: the alignment of each region, in bytes
+
+    Returns:
+        A MemoryPlan.
+
+    """
+    seen = set(lst)
+    ancestors = {}
+    for node in lst:
+        anc = set()
+        for inp in node.inputs:
+            if inp in seen:
+                anc.add(inp)
+                anc |= ancestors[inp]
+        ancestors[node] = anc
+
+    slots = {}
+    size = 0
+    for node in lst:
+        tmp = _temporary(node, seen, uses)
+        if tmp is None:
+            continue
+        dtype, shape = tmp
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        anc = ancestors[node]
+        # The regions of the temporaries that may be live with node
+        busy = sorted((offset, offset + n)
+                      for other, (offset, n, _, _) in slots.items()
+                      if not all(user in anc for user, _ in uses[other]))
+        offset = 0
+        for start, end in busy:
+            if offset + nbytes <= start:
+                break
+            offset = max(offset, -(-end // alignment) * alignment)
+        slots[node] = (offset, nbytes, dtype, shape)
+        size = max(size, offset + nbytes)
+    return MemoryPlan(slots, size)
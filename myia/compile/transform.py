@@ -1,5 +1,6 @@
 """Transforms a graph into lower-level code."""
 
+from ..debug.profile import GraphProfiler
 from ..ir import Apply, toposort, Graph, Constant
 from ..pipeline import PipelineDefinition, PipelineStep
 from ..prim import Primitive
@@ -356,14 +357,31 @@ class VMExporter(PipelineStep):
 
     Inputs:
         instrs: instruction list
+        mapping: graph map
+        specializer: the TypeSpecializer (optional)
 
     Outputs:
         output: callable
+        profiler: GraphProfiler for the callable (if profile is True)
     """
 
-    def step(self, instrs):
+    def __init__(self, pipeline_init, profile=False):
+        """Initialize a VMExporter.
+
+        Arguments:
+            profile: Whether to profile the graphs that the callable runs.
+
+        """
+        super().__init__(pipeline_init)
+        self.profile = profile
+
+    def step(self, instrs, mapping, specializer=None):
         """Make a callable."""
-        return {'output': FinalVM(instrs)}
+        vm = FinalVM(instrs, mapping)
+        if not self.profile:
+            return {'output': vm}
+        vm.profiler = GraphProfiler(specializer and specializer.originals)
+        return {'output': vm, 'profiler': vm.profiler}
 
 
 step_wrap_primitives = WrapPrimitives.partial()
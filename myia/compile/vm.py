@@ -18,11 +18,27 @@ class FinalVM:
 
     These instructions can represent multiple graphs with arbitrary
     recursion between them.
+
+    Attributes:
+        graphs: Map the position of the first instruction of each graph
+            to that graph, if a mapping was given.
+        profiler: A GraphProfiler to notify of the graphs that are
+            entered and left and of the external functions that are run,
+            or None. This requires the mapping.
+
     """
 
-    def __init__(self, code):
-        """Create a VM with the specified instructions."""
+    def __init__(self, code, mapping=None):
+        """Create a VM with the specified instructions.
+
+        Arguments:
+            code: The linked instructions.
+            mapping: The position of the first instruction of each graph.
+
+        """
         self.code = tuple(code)
+        self.graphs = {pc: g for g, pc in (mapping or {}).items()}
+        self.profiler = None
         self.stack = [None]  # The value stack
         self.retp = [-1]  # The call stack
         self.pc = 0  # program counter (next instruction)
@@ -97,14 +113,23 @@ class FinalVM:
         for a in reversed(args):
             self._push(a)
 
+        profiler = self.profiler
+        if profiler is not None:
+            depth = profiler.depth
+            profiler.enter(self.graphs[self.pc])
+
         # Main runtime loop
-        while self.pc >= 0:
-            instr = self.code[self.pc]
-            impl = getattr(self, f'inst_{instr[0]}', None)
-            if impl is None:
-                raise AssertionError(f'Unknown instruction {instr[0]}')
-            self.pc += 1
-            impl(*instr[1:])
+        try:
+            while self.pc >= 0:
+                instr = self.code[self.pc]
+                impl = getattr(self, f'inst_{instr[0]}', None)
+                if impl is None:
+                    raise AssertionError(f'Unknown instruction {instr[0]}')
+                self.pc += 1
+                impl(*instr[1:])
+        finally:
+            if profiler is not None:
+                profiler.unwind(depth)
 
         # When we reach here there should be a single value on the
         # value stack and it is the return value for the evaluation.
@@ -123,6 +148,8 @@ class FinalVM:
         """
         self._pushp()
         self._do_jmp(self._ref(jmp))
+        if self.profiler is not None:
+            self.profiler.enter(self.graphs[self.pc])
 
     def inst_tailcall(self, jmp, height, nargs):
         """Tail call.
@@ -142,6 +169,9 @@ class FinalVM:
         jmp = self._ref(jmp)
         self._move_stack(nargs, height)
         self._do_jmp(jmp)
+        if self.profiler is not None:
+            self.profiler.leave()
+            self.profiler.enter(self.graphs[self.pc])
 
     def inst_return(self, rpos, height):
         """Return.
@@ -159,6 +189,8 @@ class FinalVM:
         self._pop(height)
         self._push(rv)
         self._popp()
+        if self.profiler is not None:
+            self.profiler.leave()
 
     def inst_partial(self, fn_, *args_):
         """Create a partial application.
@@ -268,6 +300,8 @@ class FinalVM:
            args: sequence of stack references.
 
         """
+        if self.profiler is not None:
+            self.profiler.external(fn)
         outs = fn(*(self._ref(a) for a in args))
         for o in outs:
             self._push(o)
@@ -0,0 +1,180 @@
+"""Graph-level profiling of the virtual machines."""
+
+import time
+from collections import Counter
+
+from ..ir import Graph, toposort
+from ..prim import Primitive
+
+from .label import label
+
+
+class GraphProfiler:
+    """Attribute the time spent running graphs to the original graphs.
+
+    The VMs call `enter` and `leave` around each application of a graph,
+    and report the primitives that they run. The graphs that are run are
+    mapped back to the graph that was specialized to make them, using
+    `originals` and the `about` relations of their debug information, so
+    that all the specializations and copies of a function or block share
+    the same entry. A tail call leaves the current graph before entering
+    the next one, so that a loop is counted as a number of calls from the
+    graph that started it.
+
+    A GraphProfiler can be given to `pstats.Stats`, in which case each
+    graph is identified by its source location and label, and primitives
+    by `('~', 0, '<primitive name>')`. Primitives are only counted: the
+    time spent in them is part of the self time of the graph that runs
+    them.
+
+    Attributes:
+        originals: Map each specialized graph to its original graph, for
+            example `TypeSpecializer.originals`.
+        timer: The function that returns the current time.
+        stats: The statistics in the format of `pstats`, once
+            `create_stats` is called.
+
+    """
+
+    def __init__(self, originals=None, timer=time.perf_counter):
+        """Initialize a GraphProfiler."""
+        self.originals = originals or {}
+        self.timer = timer
+        self.stats = {}
+        self._keys = {}
+        self._segments = {}
+        # Map each key to [cc, nc, tt, ct, callers], where callers maps
+        # the key of each caller to [cc, nc, tt, ct]
+        self._entries = {}
+        self._primitives = Counter()
+        self._active = Counter()
+        self._stack = []
+
+    def _original(self, graph):
+        g = graph
+        while g not in self.originals:
+            about = g.debug.about
+            g = about and about.debug.obj
+            if not isinstance(g, Graph):
+                return graph
+        return self.originals[g]
+
+    def key(self, graph):
+        """Return the (filename, line, name) of the original of a graph."""
+        if graph not in self._keys:
+            orig = self._original(graph)
+            loc = orig.debug.find('location')
+            if loc is None:
+                self._keys[graph] = ('~', 0, label(orig))
+            else:
+                self._keys[graph] = (loc.filename, loc.line, label(orig))
+        return self._keys[graph]
+
+    def enter(self, graph):
+        """Start an application of graph."""
+        key = self.key(graph)
+        self._active[key] += 1
+        self._stack.append([key, self.timer(), 0.0])
+
+    def leave(self):
+        """End the current application of a graph."""
+        key, start, inner = self._stack.pop()
+        elapsed = self.timer() - start
+        outermost = self._active[key] == 1
+        self._active[key] -= 1
+        if self._stack:
+            caller = self._stack[-1]
+            caller[2] += elapsed
+            caller = caller[0]
+        else:
+            caller = None
+        if key not in self._entries:
+            self._entries[key] = [0, 0, 0.0, 0.0, {}]
+        entry = self._entries[key]
+        for stats in (entry, entry[4].setdefault(caller, [0, 0, 0.0, 0.0])):
+            stats[1] += 1
+            stats[2] += elapsed - inner
+            if outermost:
+                stats[0] += 1
+                stats[3] += elapsed
+
+    def unwind(self, depth=0):
+        """Leave the graphs that were entered after the stack had depth.
+
+        This is used when an error interrupts the graphs.
+        """
+        while len(self._stack) > depth:
+            self.leave()
+
+    @property
+    def depth(self):
+        """The number of graphs that are currently running."""
+        return len(self._stack)
+
+    def primitive(self, prim, n=1):
+        """Count n applications of a primitive by the current graph."""
+        caller = self._stack[-1][0] if self._stack else None
+        self._primitives[prim, caller] += n
+
+    def external(self, fn):
+        """Count the primitives of a linear segment made by debug_convert.
+
+        The segment is a graph without branches, so each of its
+        primitives is applied once every time it is run. Other functions
+        are not counted.
+        """
+        g = getattr(fn, 'graph', None)
+        if not isinstance(g, Graph):
+            return
+        if g not in self._segments:
+            self._segments[g] = Counter(
+                node.inputs[0].value
+                for node in toposort(g.output)
+                if node.is_apply() and node is not g.output
+                and node.inputs[0].is_constant(Primitive)
+            )
+        for prim, n in self._segments[g].items():
+            self.primitive(prim, n)
+
+    def create_stats(self):
+        """Fill `stats` with the statistics in the format of `pstats`."""
+        stats = {}
+        for key, (cc, nc, tt, ct, callers) in self._entries.items():
+            stats[key] = (cc, nc, tt, ct,
+                          {c: tuple(s) for c, s in callers.items()
+                           if c is not None})
+        for (prim, caller), n in self._primitives.items():
+            key = ('~', 0, f'<primitive {prim}>')
+            cc, nc, tt, ct, callers = stats.get(key, (0, 0, 0.0, 0.0, {}))
+            if caller is not None:
+                callers[caller] = (n, n, 0.0, 0.0)
+            stats[key] = (cc + n, nc + n, tt, ct, callers)
+        self.stats = stats
+
+    def report(self, n=10):
+        """Return a report about the graphs with the most self time.
+
+        Arguments:
+            n: The number of graphs and of primitives to list.
+
+        Returns:
+            A string with one line for each of the n graphs with the most
+            self time, with their number of calls, self time and
+            inclusive time, followed by one line for each of the n
+            primitives that were applied the most.
+
+        """
+        entries = sorted(self._entries.items(), key=lambda kv: -kv[1][2])
+        prims = Counter()
+        for (prim, _), count in self._primitives.items():
+            prims[prim] += count
+        total = sum(e[2] for e in self._entries.values())
+        lines = [f'{sum(e[1] for e in self._entries.values())} graph calls'
+                 f' and {sum(prims.values())} primitive calls'
+                 f' in {total:.6f}s']
+        for (filename, line, name), (_, nc, tt, ct, _) in entries[:n]:
+            lines.append(f'{nc:>8} {tt:10.6f} {ct:10.6f} {name}'
+                         f' ({filename}:{line})')
+        for prim, count in prims.most_common(n):
+            lines.append(f'{count:>8} {"":10} {"":10} <primitive {prim}>')
+        return '\n'.join(lines)
@@ -3,7 +3,7 @@
 
 from . import operations
 from .infer import InferenceError
-from .ir import MetaGraph, Graph
+from .ir import MetaGraph, Graph, graph_hash
 from .dtype import Array, List, Tuple, Class, Type, tag_to_dataclass, \
     pytype_to_myiatype
 from .utils import TypeMap, Overload
@@ -47,6 +47,7 @@ class HyperMap(MetaGraph):
             self.make_map[t] = self._full_make.map[t]
         self.nonleaf = nonleaf
         self.cache = {}
+        self.expansions = {}
 
     _full_make = Overload()
 
@@ -160,6 +161,13 @@ class HyperMap(MetaGraph):
             argmap[g.add_parameter()] = t
         argmap = self._harmonize(resources, g, argmap)
         g.output = self._make(resources, g, fnarg, argmap)
-        resources.manager.add_graph(g)
+        # The expansions for different types are often identical, e.g. for
+        # tuples of the same length, in which case the first one is reused.
+        key = graph_hash(g, properties=(), opaque=lambda g2: True)
+        if key in self.expansions:
+            g = self.expansions[key]
+        else:
+            resources.manager.add_graph(g)
+            self.expansions[key] = g
         self.cache[types] = g
         return g
@@ -1,8 +1,9 @@
 """Core of the inference engine (not Myia-specific)."""
 
 import asyncio
-from contextvars import copy_context
-from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from collections import defaultdict, deque
 
 from ..dtype import Array, List, Tuple, Function, TypeMeta
 from ..utils import Unification, Var, RestrictedVar, eprint, overload
@@ -10,6 +11,11 @@ from ..utils import Unification, Var, RestrictedVar, eprint, overload
 from .utils import InferenceError, DynamicMap, MyiaTypeError, ValueWrapper
 
 
+# Key of the EvaluationCache entry being computed in the current task. This
+# is how dependencies between entries are discovered.
+_current_key = ContextVar('_current_key', default=None)
+
+
 class MyiaTypeMismatchError(MyiaTypeError):
     """Error where two values should have the same type, but don't."""
 
@@ -149,23 +155,29 @@ class EvaluationCache:
         loop: The InferenceLoop for async evaluation.
         keycalc: An async function that takes a key and returns
             the value associated to that key.
+        dependents: If dependencies are tracked, map each key to the set
+            of keys whose computation requested it. Otherwise, None.
 
     """
 
-    def __init__(self, loop, keycalc):
+    def __init__(self, loop, keycalc, track_dependencies=False):
         """Initialize an EvaluationCache."""
         self.cache = {}
         self.loop = loop
         self.keycalc = keycalc
+        self.dependents = defaultdict(set) if track_dependencies else None
 
     def get(self, key):
         """Get the future associated to the key."""
+        self.depend(key)
         if key not in self.cache:
             self.set(key, self.keycalc(key))
         return self.cache[key]
 
     def set(self, key, coro):
         """Associate a key to a coroutine."""
+        if self.dependents is not None:
+            coro = self._evaluate(key, coro)
         self.cache[key] = self.loop.create_task(coro)
 
     def set_value(self, key, value):
@@ -177,6 +189,55 @@ class EvaluationCache:
         fut.set_result(value)
         self.cache[key] = fut
 
+    async def _evaluate(self, key, coro):
+        # Each task runs in its own copy of the context, so this does not
+        # leak into the task that requested the key.
+        _current_key.set(key)
+        return await coro
+
+    def depend(self, key):
+        """Record that the key being currently computed depends on key.
+
+        This does nothing if dependencies are not tracked.
+        """
+        if self.dependents is not None:
+            user = _current_key.get()
+            if user is not None and user != key:
+                self.dependents[key].add(user)
+
+    @contextmanager
+    def evaluating(self, key):
+        """Attribute the requests made in this block to key.
+
+        This can be used to track dependencies for keys that are not
+        stored in this cache, e.g. the entries of a DynamicMap.
+        """
+        token = _current_key.set(key)
+        try:
+            yield
+        finally:
+            _current_key.reset(token)
+
+    def invalidate(self, keys):
+        """Drop the given keys and every key that depends on them.
+
+        Returns:
+            The set of all keys that were invalidated, including keys that
+            may not be stored in this cache.
+
+        """
+        todo = list(keys)
+        done = set()
+        while todo:
+            key = todo.pop()
+            if key in done:
+                continue
+            done.add(key)
+            self.cache.pop(key, None)
+            if self.dependents is not None:
+                todo.extend(self.dependents.pop(key, ()))
+        return done
+
 
 class EquivalenceChecker:
     """Handle equivalence between values."""
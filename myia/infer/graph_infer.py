@@ -1,6 +1,7 @@
 """Inference engine for Myia graphs."""
 
 import asyncio
+from collections import defaultdict
 from types import FunctionType
 
 from ..dtype import ismyiatype, Function
@@ -247,6 +248,21 @@ class Inferrer(DynamicMap):
         self.engine = track.engine
         self.identifier = identifier
 
+    async def __call__(self, *args):
+        """Infer a property of the operation on the given arguments.
+
+        If the engine tracks dependencies, the requests made to infer this
+        call are attributed to the `(self, args)` key, so that the result can
+        be dropped from the cache when they are invalidated.
+        """
+        cache = self.engine.cache
+        if cache.dependents is None:
+            return await super().__call__(*args)
+        key = (self, args)
+        cache.depend(key)
+        with cache.evaluating(key):
+            return await super().__call__(*args)
+
 
 class PrimitiveInferrer(Inferrer):
     """Infer a property of the result of a primitive.
@@ -597,6 +613,10 @@ class InferenceEngine:
             the evaluation of a required track.
         eq_class: The class to use to check equivalence between
             values.
+        incremental: Whether to track dependencies between inference
+            results. If True, results for nodes that are modified through
+            the manager are dropped along with the results that depend on
+            them, and calling `run` again only recomputes these.
 
     """
 
@@ -605,7 +625,8 @@ class InferenceEngine:
                  *,
                  tracks,
                  required_tracks=None,
-                 eq_class=EquivalenceChecker):
+                 eq_class=EquivalenceChecker,
+                 incremental=False):
         """Initialize the InferenceEngine."""
         self.loop = InferenceLoop()
         self.pipeline = pipeline
@@ -616,12 +637,49 @@ class InferenceEngine:
             for name, t in tracks.items()
         }
         self.required_tracks = required_tracks or self.all_track_names
-        self.cache = EvaluationCache(loop=self.loop, keycalc=self.compute_ref)
+        self.incremental = incremental
+        self.cache = EvaluationCache(loop=self.loop,
+                                     keycalc=self.compute_ref,
+                                     track_dependencies=incremental)
         self.errors = []
         self.equiv = eq_class(
             loop=self.loop,
             error_callback=self.errors.append
         )
+        # Map each node to the cache keys computed for it
+        self._node_keys = defaultdict(set)
+        if incremental:
+            evts = self.mng.events
+            evts.add_edge.register(self._on_edge)
+            evts.drop_edge.register(self._on_edge)
+            evts.add_node.register(self._on_node)
+            evts.drop_node.register(self._on_node)
+
+    def _on_edge(self, event, node, key, inp):
+        self.invalidate(node)
+
+    def _on_node(self, event, node):
+        if node.is_parameter() and node.graph is not None:
+            # The graph's signature changed, so calls to it must be
+            # reinferred.
+            self.invalidate(node.graph.return_)
+
+    def invalidate(self, *nodes):
+        """Drop the results for the nodes and all results that depend on them.
+
+        Dropped results are recomputed the next time they are requested,
+        e.g. when `run` is called again on the same graph.
+        """
+        keys = set()
+        for node in nodes:
+            keys |= self._node_keys.pop(node, set())
+        for target, arg in self.cache.invalidate(keys):
+            if isinstance(target, Inferrer):
+                target.cache.pop(arg, None)
+            elif isinstance(arg, Reference):
+                node_keys = self._node_keys.get(arg.node, None)
+                if node_keys:
+                    node_keys.discard((target, arg))
 
     def run(self, graph, argvals):
         """Run the inferrer on a graph given initial values.
@@ -671,6 +729,8 @@ class InferenceEngine:
             return await ref.get_raw(track_name)
 
         node = ref.node
+        if self.incremental:
+            self._node_keys[node].add(key)
         inferred = ref.node.inferred.get(track_name, UNKNOWN)
 
         if inferred is not UNKNOWN:
@@ -4,6 +4,7 @@ import threading
 import traceback
 import types
 import weakref
+from contextlib import contextmanager
 from typing import Any, Set
 
 # We use per-thread storage for the about stack.
@@ -16,6 +17,21 @@ def current_info():
     return _about.stack[-1]
 
 
+@contextmanager
+def inherit_from(info):
+    """Create `DebugInfo` objects as if info was the current context.
+
+    This is used to create a `DebugInfo` lazily, in the context that was
+    current when the object it describes was created. If info is None,
+    the `DebugInfo` will not inherit any attributes.
+    """
+    _about.stack.append(info)
+    try:
+        yield
+    finally:
+        _about.stack.pop()
+
+
 class DebugInfo(types.SimpleNamespace):
     """Debug information for an object.
 
@@ -56,11 +72,14 @@ class DebugInherit(DebugInfo):
         Any `DebugInfo` created within the context of
         `with self: ...` will inherit all attributes of `self`.
         """
-        _about.stack.append(self)
+        if current_info() is NO_DEBUG_INFO:
+            _about.stack.append(NO_DEBUG_INFO)
+        else:
+            _about.stack.append(self)
 
     def __exit__(self, type, value, tb):
         """Exit the context of this `DebugInherit`."""
-        assert _about.stack[-1] is self
+        assert _about.stack[-1] in (self, NO_DEBUG_INFO)
         _about.stack.pop()
 
 
@@ -80,6 +99,12 @@ class NamedDebugInfo(DebugInfo):
 
     _curr_id = 0
 
+    def __new__(cls, obj=None, **kwargs):
+        """Return `NO_DEBUG_INFO` if debug information is disabled."""
+        if current_info() is NO_DEBUG_INFO:
+            return NO_DEBUG_INFO
+        return super().__new__(cls)
+
     def __init__(self, obj=None, **kwargs):
         """Construct a NamedDebugInfo object."""
         self._id: int = None
@@ -131,6 +156,62 @@ class NamedDebugInfo(DebugInfo):
             return None
 
 
+class _NoDebugInfo(NamedDebugInfo):
+    """Shared NamedDebugInfo for when debug information is disabled.
+
+    It has no attributes of its own and ignores assignments, so that the
+    code that sets debug information does not have to check whether it is
+    enabled.
+    """
+
+    name = None
+    about = None
+    save_trace = False
+    trace = None
+    obj = None
+    id = None
+    debug_name = '_'
+
+    def __init__(self, obj=None, **kwargs):
+        pass
+
+    def __setattr__(self, attr, value):
+        pass
+
+    @property
+    def errors(self):
+        # A new set each time, so that adding errors to it has no effect
+        return set()
+
+    def __repr__(self):
+        return 'NO_DEBUG_INFO'
+
+
+NO_DEBUG_INFO = types.SimpleNamespace.__new__(_NoDebugInfo)
+
+
+@contextmanager
+def debug_info(enabled):
+    """Enable or disable the capture of debug information in a context.
+
+    While it is disabled, every `NamedDebugInfo` is `NO_DEBUG_INFO`, the
+    contexts of `About` and `DebugInherit` have no effect, and no trace is
+    saved. This is meant for production compiles, in which the debug
+    information is never read. It applies to the current thread only. If
+    enabled is None, the current setting is kept.
+
+    >>> with debug_info(False):
+    ...     assert NamedDebugInfo(name='x') is NO_DEBUG_INFO
+    """
+    top = current_info()
+    if enabled:
+        top = None if top is NO_DEBUG_INFO else top
+    elif enabled is not None:
+        top = NO_DEBUG_INFO
+    with inherit_from(top):
+        yield
+
+
 class About:
     """Represent a relationship to an object.
 
@@ -158,10 +239,14 @@ class About:
 
     def __enter__(self):
         """Enter the context of this `About`."""
-        _about.stack.append(DebugInherit(about=self))
+        if current_info() is NO_DEBUG_INFO:
+            _about.stack.append(NO_DEBUG_INFO)
+        else:
+            _about.stack.append(DebugInherit(about=self))
 
     def __exit__(self, type, value, tb):
         """Exit the context of this `About`."""
         top = _about.stack[-1]
-        assert isinstance(top, DebugInfo) and top.about is self
+        assert top is NO_DEBUG_INFO \
+            or (isinstance(top, DebugInfo) and top.about is self)
         _about.stack.pop()
@@ -9,6 +9,9 @@ from .manager import (  # noqa
 from .metagraph import (  # noqa
     GraphGenerationError, MetaGraph, MultitypeGraph
 )
+from .serialize import (  # noqa
+    SerializationError, dump, dumps, load, loads, graph_hash
+)
 from .utils import (  # noqa
     succ_deep, succ_deeper, succ_incoming,
     exclude_from_set, freevars_boundary,
@@ -15,6 +15,8 @@ class Node(ABC):
 
     """
 
+    __slots__ = ()
+
     @property
     @abstractmethod
     def incoming(self) -> Iterable['Node']:
@@ -10,11 +10,10 @@ returning a nested function creates a closure.
 
 """
 
-from collections import defaultdict
 from typing import Any, Iterable, List, Union, Dict
 
 from ..dtype import Function
-from ..info import NamedDebugInfo
+from ..info import NamedDebugInfo, current_info, inherit_from
 from ..prim import ops as primops, Primitive
 from ..utils import Named, list_str, repr_, UNKNOWN
 from ..utils.unify import expandlist, noseq
@@ -200,6 +199,76 @@ class Graph:
                      return_=self.return_)
 
 
+class Inferred:
+    """The properties inferred for a node.
+
+    This behaves like a dictionary in which missing properties are
+    `UNKNOWN`. The type and shape are stored in slots, and the other
+    properties in a dictionary that is only created when one is set.
+    """
+
+    __slots__ = ('type', 'shape', 'extra')
+    _slot_names = frozenset(__slots__[:2])
+
+    def __init__(self) -> None:
+        """Initialize an empty Inferred."""
+        self.type = UNKNOWN
+        self.shape = UNKNOWN
+        self.extra = None
+
+    def __getitem__(self, key):
+        if key in self._slot_names:
+            return getattr(self, key)
+        if self.extra is None:
+            return UNKNOWN
+        return self.extra.get(key, UNKNOWN)
+
+    def __setitem__(self, key, value):
+        if key in self._slot_names:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self[key] is not UNKNOWN
+
+    def get(self, key, default=None):
+        """Return the property for key, or default if it is unknown."""
+        value = self[key]
+        return default if value is UNKNOWN else value
+
+    def keys(self):
+        """Return the names of the known properties."""
+        return [k for k in self if k in self]
+
+    def items(self):
+        """Return the (name, value) pairs of the known properties."""
+        return [(k, self[k]) for k in self.keys()]
+
+    def update(self, other):
+        """Set the properties from a mapping."""
+        for k, v in other.items():
+            self[k] = v
+
+    def __iter__(self):
+        yield from ('type', 'shape')
+        if self.extra is not None:
+            yield from self.extra
+
+    def __copy__(self):
+        res = Inferred()
+        res.type = self.type
+        res.shape = self.shape
+        if self.extra is not None:
+            res.extra = dict(self.extra)
+        return res
+
+    def __repr__(self) -> str:
+        return repr_(self, **dict(self.items()))
+
+
 class ANFNode(Node):
     """A node in the graph-based ANF IR.
 
@@ -220,18 +289,44 @@ class ANFNode(Node):
             attribute, creating a doubly linked graph structure. Note that this
             container is updated automatically; do not manipulate it manually.
         debug: An object with debug information about this node e.g. a
-            human-readable name and the Python source code.
+            human-readable name and the Python source code. It is created
+            on first access, from the debug context in which the node was
+            created.
+        inferred: The properties inferred for this node, as an `Inferred`.
 
     """
 
+    __slots__ = ('inputs', 'value', 'graph', '_debug', 'inferred',
+                 '__weakref__')
+
     def __init__(self, inputs: Iterable['ANFNode'], value: Any,
                  graph: Graph) -> None:
         """Construct a node."""
         self.inputs = list(inputs)
         self.value = value
         self.graph = graph
-        self.debug = NamedDebugInfo(self)
-        self.inferred = defaultdict(lambda: UNKNOWN)
+        top = current_info()
+        if top is not None and getattr(top, 'save_trace', False):
+            # The trace must be taken now
+            self._debug = NamedDebugInfo(self)
+        else:
+            self._debug = top
+        self.inferred = Inferred()
+
+    @property
+    def debug(self):
+        """Return the node's NamedDebugInfo, creating it if needed."""
+        debug = self._debug
+        if not isinstance(debug, NamedDebugInfo):
+            with inherit_from(debug):
+                debug = NamedDebugInfo(self)
+            self._debug = debug
+        return debug
+
+    @debug.setter
+    def debug(self, value):
+        """Set the node's NamedDebugInfo."""
+        self._debug = value
 
     @property
     def type(self):
@@ -284,6 +379,8 @@ class Apply(ANFNode):
 
     """
 
+    __slots__ = ()
+
     def __init__(self, inputs: List[ANFNode], graph: 'Graph') -> None:
         """Construct an application."""
         super().__init__(inputs, APPLY, graph)
@@ -301,6 +398,8 @@ class Apply(ANFNode):
         g = noseq(fn, self.graph)
         app = Apply(new_inputs, g)
         app.type = self.type
+        if 'shape' in self.inferred:
+            app.inferred['shape'] = self.inferred['shape']
         return app
 
     def __repr__(self) -> str:
@@ -317,6 +416,8 @@ class Parameter(ANFNode):
 
     """
 
+    __slots__ = ()
+
     def __init__(self, graph: Graph) -> None:
         """Construct the parameter."""
         super().__init__([], PARAMETER, graph)
@@ -354,6 +455,8 @@ class Constant(ANFNode):
 
     """
 
+    __slots__ = ()
+
     def __init__(self, value: Any) -> None:
         """Construct a literal."""
         super().__init__([], value, None)
@@ -1,10 +1,123 @@
 """Graph cloning facility."""
 
+import weakref
+from collections import defaultdict
 from copy import copy
 
 from .anf import Apply, Constant, Graph
-from ..info import About
-from .manager import manage
+from ..info import About, NamedDebugInfo, inherit_from
+
+
+class _LazyAbout(About):
+    """About a node whose debug information is only created if needed.
+
+    The node is only referred to weakly, so that its clones do not keep it
+    alive. If it is gone when the debug information is read, that
+    information is created from the context the node was created in.
+    """
+
+    def __init__(self, node, relation):
+        self._node = weakref.ref(node)
+        self._debug = node._debug
+        self.relation = relation
+
+    @property
+    def debug(self):
+        debug = self._debug
+        if not isinstance(debug, NamedDebugInfo):
+            node = self._node()
+            if node is not None:
+                debug = node.debug
+            else:
+                with inherit_from(debug):
+                    debug = NamedDebugInfo()
+            self._debug = debug
+        return debug
+
+
+class _GraphWalk:
+    """The information GraphCloner needs about unmanaged graphs.
+
+    This walks the graphs once, like a weak GraphManager would, but only
+    computes the statistics that GraphCloner reads: `nodes`, `constants`,
+    `graph_constants`, `graphs_used` and `scopes`.
+    """
+
+    def __init__(self, graphs):
+        self.nodes = defaultdict(set)
+        self.constants = defaultdict(set)
+        self.graph_constants = defaultdict(set)
+        self.graphs_used = defaultdict(set)
+        self.deps = defaultdict(set)
+        self.graphs = set()
+        self._scopes = None
+
+        todo = []
+        seen = set()
+
+        def add_graph(g):
+            if g not in self.graphs:
+                self.graphs.add(g)
+                todo.extend(g.parameters)
+                todo.append(g.return_)
+
+        for g in graphs:
+            add_graph(g)
+
+        while todo:
+            node = todo.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            g = node.graph
+            if g is None:
+                continue
+            add_graph(g)
+            self.nodes[g].add(node)
+            for inp in node.inputs:
+                if inp.is_constant():
+                    self.constants[g].add(inp)
+                    if inp.is_constant_graph():
+                        self.graph_constants[inp.value].add(inp)
+                        self.graphs_used[g].add(inp.value)
+                        add_graph(inp.value)
+                elif inp.graph is not g:
+                    self.deps[g].add(inp.graph)
+                todo.append(inp)
+
+    def _deps_total(self, g, path):
+        # The graphs g gets free variables from, directly or through the
+        # graphs it uses (same as GDepTotalStatistic).
+        if g in path:
+            return set()
+        path = path | {g}
+        res = set(self.deps[g])
+        for used in self.graphs_used[g]:
+            res |= self._deps_total(used, path)
+        res.discard(g)
+        return res
+
+    @property
+    def scopes(self):
+        """Map each graph to itself and all the graphs nested in it."""
+        if self._scopes is None:
+            deps = {g: self._deps_total(g, frozenset()) for g in self.graphs}
+            ancestors = {}
+
+            def get_ancestors(g):
+                if g not in ancestors:
+                    res = set()
+                    for dep in deps[g]:
+                        res.add(dep)
+                        res |= get_ancestors(dep)
+                    ancestors[g] = res
+                return ancestors[g]
+
+            self._scopes = {g: {g} for g in self.graphs}
+            for g in self.graphs:
+                for anc in get_ancestors(g):
+                    self._scopes[anc].add(g)
+        return self._scopes
 
 
 #################
@@ -101,7 +214,7 @@ class GraphCloner:
                 target_graph = Graph()
                 target_graph.flags = copy(graph.flags)
             for p in graph.parameters:
-                with About(p.debug, self.relation):
+                with _LazyAbout(p, self.relation):
                     p2 = target_graph.add_parameter()
                     p2.inferred = copy(p.inferred)
                     self.repl[p] = p2
@@ -110,19 +223,19 @@ class GraphCloner:
         for node in mng.nodes[graph]:
             if node in self.repl:
                 continue
-            with About(node.debug, self.relation):
+            with _LazyAbout(node, self.relation):
                 new = Apply([], target_graph)
-                new.inferred = copy(node.inferred)
-                self.repl[node] = new
-                self.nodes.append((node, new))
+            new.inferred = copy(node.inferred)
+            self.repl[node] = new
+            self.nodes.append((node, new))
 
         if not inline:
             target_graph.return_ = self.repl[graph.return_]
             for ct in mng.graph_constants[graph]:
-                with About(ct.debug, self.relation):
+                with _LazyAbout(ct, self.relation):
                     new = Constant(target_graph)
-                    new.inferred = copy(ct.inferred)
-                    self.repl[ct] = new
+                new.inferred = copy(ct.inferred)
+                self.repl[ct] = new
 
         if self.clone_constants:
             for ct in mng.constants[graph]:
@@ -151,16 +264,22 @@ class GraphCloner:
         if not todo:
             return
 
-        self.manager = manage(*[g for g, _, _ in todo], weak=True)
+        graphs = [g for g, _, _ in todo]
+        managers = {g._manager for g in graphs}
+        if len(managers) == 1 and None not in managers:
+            # The statistics are already computed and kept up to date.
+            self.manager, = managers
+        else:
+            self.manager = _GraphWalk(graphs)
 
         while todo:
             item = todo.pop()
             self._process_graph(*item)
 
+        repl = self.repl
         for old_node, new_node in self.nodes:
-            for inp in old_node.inputs:
-                repl = self.repl.get(inp, inp)
-                new_node.inputs.append(repl)
+            new_node.inputs = [repl.get(inp, inp) for inp in old_node.inputs]
+        self.nodes = []
 
     def __getitem__(self, x):
         """Get the clone of the given graph or node."""
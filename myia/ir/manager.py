@@ -1,7 +1,8 @@
 """Managing graph modification and information about graphs."""
 
 
-from collections import defaultdict, Counter
+from collections import Counter
+from collections.abc import Mapping
 
 from ..graph_utils import dfs, FOLLOW, EXCLUDE
 from ..utils import Events, Partializable
@@ -40,6 +41,66 @@ def manage(*graphs, weak=False):
     return manager
 
 
+class Uses(Mapping):
+    """Map each node to the (node, key) pairs of the edges that point to it.
+
+    Most nodes have a single use, which is stored by itself rather than in
+    a set that would take several times more memory. Nodes that have no
+    uses are not in the map, and looking them up returns an empty tuple.
+    """
+
+    __slots__ = ('_uses',)
+
+    def __init__(self):
+        """Initialize Uses."""
+        self._uses = {}
+
+    def __getitem__(self, node):
+        uses = self._uses.get(node)
+        if uses is None:
+            return ()
+        elif type(uses) is tuple:
+            return (uses,)
+        else:
+            return uses
+
+    def get(self, node, default=None):
+        """Return the uses of node, or default if it has none."""
+        return self[node] if node in self._uses else default
+
+    def __contains__(self, node):
+        return node in self._uses
+
+    def __iter__(self):
+        return iter(self._uses)
+
+    def __len__(self):
+        return len(self._uses)
+
+    def add(self, node, use):
+        """Add a use to node."""
+        uses = self._uses.get(node)
+        if uses is None:
+            self._uses[node] = use
+        elif type(uses) is tuple:
+            if uses != use:
+                self._uses[node] = {uses, use}
+        else:
+            uses.add(use)
+
+    def remove(self, node, use):
+        """Remove a use from node."""
+        uses = self._uses[node]
+        if type(uses) is tuple:
+            if uses != use:
+                raise KeyError(use)
+            del self._uses[node]
+        else:
+            uses.remove(use)
+            if len(uses) == 1:
+                self._uses[node], = uses
+
+
 class ParentProxy:
     """Represents a graph's immediate parent."""
 
@@ -55,7 +116,11 @@ class ParentProxy:
 
 
 class PerGraphStatistic(dict):
-    """Represents a statistic that maps each graph to some information."""
+    """Represents a statistic that maps each graph to some information.
+
+    The statistic is built from the current state of the manager when it
+    is created, and then kept up to date through the manager's events.
+    """
 
     constructor = dict
     include_graph_none = False
@@ -69,10 +134,26 @@ class PerGraphStatistic(dict):
         evts.drop_node.register(self._on_drop_node)
         evts.add_graph.register(self._on_add_graph)
         evts.drop_graph.register(self._on_drop_graph)
-        evts.add_edge.register(self._on_add_edge)
-        evts.drop_edge.register(self._on_drop_edge)
+        evts.mod_edges.register(self._on_mod_edges)
         if self.include_graph_none:
             self[None] = self.constructor()
+        self._build()
+
+    def _build(self):
+        mng = self.manager
+        for graph in mng.graphs:
+            self._on_add_graph(None, graph)
+        for node in mng.all_nodes:
+            if node.graph is None or node.graph in mng.graphs:
+                self._on_add_node(None, node)
+        edges = [(node, key, inp, 1)
+                 for inp, uses in mng.uses.items()
+                 for node, key in uses]
+        # The edges that were not flushed yet will be given to this
+        # statistic, so they must not be counted twice.
+        edges += [(node, key, inp, -direction)
+                  for node, key, inp, direction in mng._edges]
+        self._on_mod_edges(None, edges)
 
     def reset(self):
         """Reset this graph's information."""
@@ -90,6 +171,13 @@ class PerGraphStatistic(dict):
     def _on_drop_node(self, event, node):
         pass
 
+    def _on_mod_edges(self, event, edges):
+        for node, key, value, direction in edges:
+            if direction == 1:
+                self._on_add_edge(event, node, key, value)
+            else:
+                self._on_drop_edge(event, node, key, value)
+
     def _on_add_edge(self, event, node, key, value):
         pass
 
@@ -148,83 +236,119 @@ class CounterStatistic(PerGraphStatistic):
             # or a new features, in which case this can be a no-op
             raise ValueError('qty cannot be 0')  # pragma: no cover
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
-        raise NotImplementedError()
-
-    def _on_add_edge(self, event, node, key, inp):
-        self._on_mod_edge(event, node, key, inp, 1)
+    def _on_mod_edges(self, event, edges):
+        """Apply the net change of a batch of edges to the counters.
 
-    def _on_drop_edge(self, event, node, key, inp):
-        self._on_mod_edge(event, node, key, inp, -1)
+        Each counter is modified at most once, so that an edge that is
+        removed and then added back in the same batch costs nothing.
+        Returns a list of (graph, key, present) for each key that was
+        added (present is True) or removed (present is False).
+        """
+        deltas = Counter()
+        for node, key, inp, direction in edges:
+            self._edge_deltas(deltas, node, key, inp, direction)
+        changes = []
+        for (graph, key), qty in deltas.items():
+            if qty and self.mod(graph, key, qty):
+                changes.append((graph, key, qty > 0))
+        return changes
+
+    def _edge_deltas(self, deltas, node, key, inp, direction):
+        """Add the changes caused by one edge to deltas.
+
+        deltas maps (graph, key) pairs to a change of count.
+        """
+        raise NotImplementedError()
 
 
 class ConstantsStatistic(CounterStatistic):
     """Implements `GraphManager.constants`."""
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         if inp.is_constant():
-            self.mod(node.graph, inp, direction)
+            deltas[node.graph, inp] += direction
 
 
 class GraphConstantsStatistic(CounterStatistic):
     """Implements `GraphManager.graph_constants`."""
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         if inp.is_constant_graph():
-            self.mod(inp.value, inp, direction)
+            deltas[inp.value, inp] += direction
 
 
 class FVDirectStatistic(CounterStatistic):
     """Implements `GraphManager.free_variables_direct`."""
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         g1 = node.graph
         g2 = inp.graph
         if g1 and g2 and g1 is not g2:
-            self.mod(g1, inp, direction)
+            deltas[g1, inp] += direction
 
 
 class GDepDirectStatistic(CounterStatistic):
     """Implements `GraphManager.graph_dependencies_direct`."""
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         g1 = node.graph
         g2 = inp.graph
         if g1 and g2 and g1 is not g2:
-            self.mod(g1, g2, direction)
+            deltas[g1, g2] += direction
 
 
 class GDepProxStatistic(CounterStatistic):
     """Implements `GraphManager.graph_dependencies_prox`."""
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    def _on_mod_edges(self, event, edges):
+        # The nesting only changes if a dependency appears or disappears,
+        # and it is invalidated once for the whole batch. Using a graph
+        # that has no free variables, which is the case of most graphs
+        # that are called, does not change anything.
+        changes = super()._on_mod_edges(event, edges)
+        total = self.manager.__dict__.get('_graph_dependencies_total')
+        for graph, key, present in changes:
+            if total is None or not total.valid \
+                    or not isinstance(key, ParentProxy) \
+                    or total.get(key.graph) != set():
+                self.manager.events.invalidate_nesting()
+                break
+        return changes
+
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         g1 = node.graph
 
         if inp.is_constant_graph():
-            ig = inp.value
-            if self.mod(g1, ParentProxy(ig), direction):
-                self.manager.events.invalidate_nesting()
+            deltas[g1, ParentProxy(inp.value)] += direction
 
         g2 = inp.graph
         if g1 and g2 and g1 is not g2:
-            if self.mod(g1, g2, direction):
-                self.manager.events.invalidate_nesting()
+            deltas[g1, g2] += direction
 
 
 class GraphsUsedStatistic(CounterStatistic):
-    """Implements `GraphManager.graphs_used`."""
+    """Implements `GraphManager.graphs_used`.
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    The `mod_graphs_used` event is fired with the changes of each batch.
+    """
+
+    def _on_mod_edges(self, event, edges):
+        changes = super()._on_mod_edges(event, edges)
+        if changes:
+            self.manager.events.mod_graphs_used(changes)
+        return changes
+
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         if inp.is_constant_graph():
-            self.mod(node.graph, inp.value, direction)
+            deltas[node.graph, inp.value] += direction
 
 
 class GraphUsersStatistic(CounterStatistic):
     """Implements `GraphManager.graph_users`."""
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         if inp.is_constant_graph():
-            self.mod(inp.value, node.graph, direction)
+            deltas[inp.value, node.graph] += direction
 
 
 class NestingStatistic(PerGraphStatistic):
@@ -236,10 +360,17 @@ class NestingStatistic(PerGraphStatistic):
 
     def __init__(self, manager):
         """Initialize a NestingStatistic."""
+        # This must see edge changes after the statistic that invalidates
+        # the nesting.
+        manager.graph_dependencies_prox
+        self.valid = False
         super().__init__(manager)
         evts = self.manager.events
         evts.invalidate_nesting.register(self._on_invalidate_nesting)
-        self.valid = False
+
+    def _build(self):
+        # The statistic is computed the first time it is needed.
+        pass
 
     def reset(self):
         """Reset this graph's information.
@@ -253,10 +384,17 @@ class NestingStatistic(PerGraphStatistic):
         self.reset()
 
     def _on_add_graph(self, event, graph):
-        self.reset()
+        # The graph has no nodes yet, so it is at the top level and does
+        # not contain other graphs. Its nodes will invalidate the
+        # statistic if they change that.
+        if self.valid:
+            super()._on_add_graph(event, graph)
 
     def _on_drop_graph(self, event, graph):
-        self.reset()
+        # Unless the graph is at the top level and does not contain other
+        # graphs, the manager invalidates the nesting before dropping it.
+        if self.valid:
+            super()._on_drop_graph(event, graph)
 
     def recompute(self):
         """Recompute the information from scratch."""
@@ -270,6 +408,8 @@ class NestingStatistic(PerGraphStatistic):
 class GDepTotalStatistic(NestingStatistic):
     """Implements `GraphManager.graph_dependencies_total`."""
 
+    constructor = set
+
     def _recompute(self):
         all_deps = self.manager.graph_dependencies_prox
 
@@ -294,6 +434,10 @@ class GDepTotalStatistic(NestingStatistic):
 class ParentStatistic(NestingStatistic):
     """Implements `GraphManager.parents`."""
 
+    def _on_add_graph(self, event, graph):
+        if self.valid:
+            self[graph] = None
+
     def _recompute(self):
         for g in self.manager.graphs:
             self[g] = None
@@ -329,6 +473,8 @@ class ParentStatistic(NestingStatistic):
 class ChildrenStatistic(NestingStatistic):
     """Implements `GraphManager.children`."""
 
+    constructor = set
+
     def _recompute(self):
         parents = self.manager.parents
         for g in self.manager.graphs:
@@ -341,6 +487,10 @@ class ChildrenStatistic(NestingStatistic):
 class ScopeStatistic(NestingStatistic):
     """Implements `GraphManager.scopes`."""
 
+    def _on_add_graph(self, event, graph):
+        if self.valid:
+            self[graph] = {graph}
+
     def _recompute(self):
         parents = self.manager.parents
         for g in self.manager.graphs:
@@ -379,16 +529,17 @@ class FVTotalStatistic(NestingStatistic, CounterStatistic):
                     self.mod(curr, g2, count)
                     curr = mng.parents[curr]
 
-    def _on_mod_edge(self, event, node, key, inp, direction):
-        if not self.valid:
-            return
+    def _on_mod_edges(self, event, edges):
+        if self.valid:
+            super()._on_mod_edges(event, edges)
 
+    def _edge_deltas(self, deltas, node, key, inp, direction):
         g1 = node.graph
 
         def _update(stop_graph, fv):
             curr = g1
             while curr and curr is not stop_graph:
-                self.mod(curr, fv, direction)
+                deltas[curr, fv] += direction
                 curr = self.manager.parents[curr]
 
         if inp.is_constant_graph():
@@ -403,9 +554,52 @@ class FVTotalStatistic(NestingStatistic, CounterStatistic):
             _update(g2, inp)
 
 
-class GraphsReachableStatistic(NestingStatistic):
+class ReachabilityStatistic(NestingStatistic):
+    """Represents a statistic about which graphs may call which.
+
+    These statistics do not depend on the nesting. They are updated when
+    the `mod_graphs_used` event is fired, and become invalid when a change
+    cannot be applied incrementally.
+    """
+
+    def __init__(self, manager):
+        """Initialize a ReachabilityStatistic."""
+        # This must see edge changes after graphs_used is updated.
+        manager.graphs_used
+        super().__init__(manager)
+        evts = self.manager.events
+        evts.mod_graphs_used.register(self._on_mod_graphs_used)
+
+    def _on_invalidate_nesting(self, event):
+        pass
+
+    def _on_mod_graphs_used(self, event, changes):
+        raise NotImplementedError()
+
+
+class GraphsReachableStatistic(ReachabilityStatistic):
     """Implements `GraphManager.graphs_reachable`."""
 
+    constructor = set
+
+    def _on_drop_graph(self, event, graph):
+        # Dropped graphs are not used by the remaining ones.
+        super()._on_drop_graph(event, graph)
+        for gs in self.values():
+            gs.discard(graph)
+
+    def _on_mod_graphs_used(self, event, changes):
+        if not self.valid:
+            return
+        if not all(present for _, _, present in changes):
+            self.reset()
+            return
+        for g1, g2, _ in changes:
+            new = self[g2] | {g2}
+            for g, gs in self.items():
+                if g is g1 or g1 in gs:
+                    gs |= new
+
     def _recompute(self):
         used = self.manager.graphs_used
         for g, gs in used.items():
@@ -423,24 +617,144 @@ class GraphsReachableStatistic(NestingStatistic):
                     changes = True
 
 
-class RecursiveStatistic(NestingStatistic):
-    """Implements `GraphManager.recursive`."""
+class RecursiveStatistic(ReachabilityStatistic):
+    """Implements `GraphManager.recursive`.
+
+    A graph is recursive if it uses itself or if it is in the same
+    strongly connected component of the graph of uses as other graphs.
+    Most changes keep these components the same and are cheap to apply.
+    """
+
+    def __init__(self, manager):
+        """Initialize a RecursiveStatistic."""
+        self.components = {}
+        super().__init__(manager)
+
+    def reset(self):
+        """Reset this graph's information."""
+        super().reset()
+        self.components = {}
+
+    def _on_add_graph(self, event, graph):
+        if self.valid:
+            self[graph] = False
+            self.components[graph] = {graph}
+
+    def _on_drop_graph(self, event, graph):
+        if self.valid:
+            if len(self.components[graph]) > 1:
+                self.reset()
+            else:
+                del self[graph]
+                del self.components[graph]
+
+    def _reaches(self, g1, g2):
+        # Whether g1 may call g2.
+        used = self.manager.graphs_used
+        seen = {g1}
+        todo = [g1]
+        while todo:
+            g = todo.pop()
+            for g3 in used[g]:
+                if g3 is g2:
+                    return True
+                if g3 not in seen:
+                    seen.add(g3)
+                    todo.append(g3)
+        return False
+
+    def _on_mod_graphs_used(self, event, changes):
+        if not self.valid:
+            return
+        comps = self.components
+        for g1, g2, present in changes:
+            if g1 is g2:
+                self[g1] = present or len(comps[g1]) > 1
+            elif comps[g1] is comps[g2]:
+                if not present:
+                    # The component may be split.
+                    self.reset()
+                    return
+            elif present and self._reaches(g2, g1):
+                # Components are merged.
+                self.reset()
+                return
 
     def _recompute(self):
-        reach = self.manager.graphs_reachable
-        for g, gs in reach.items():
-            self[g] = g in gs
+        # Tarjan's algorithm, iteratively.
+        used = self.manager.graphs_used
+        comps = self.components
+        index = {}
+        low = {}
+        stack = []
+        for root in used:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            work = [(root, iter(used[root]))]
+            while work:
+                g, succ = work[-1]
+                for g2 in succ:
+                    if g2 not in index:
+                        index[g2] = low[g2] = len(index)
+                        stack.append(g2)
+                        work.append((g2, iter(used[g2])))
+                        break
+                    elif g2 not in comps:
+                        low[g] = min(low[g], index[g2])
+                else:
+                    work.pop()
+                    if work:
+                        g0 = work[-1][0]
+                        low[g0] = min(low[g0], low[g])
+                    if low[g] == index[g]:
+                        comp = set()
+                        while True:
+                            g2 = stack.pop()
+                            comp.add(g2)
+                            comps[g2] = comp
+                            if g2 is g:
+                                break
+        for g, comp in comps.items():
+            self[g] = len(comp) > 1 or g in used[g]
+
+
+class _Statistic:
+    """Statistic of a GraphManager that is created the first time it is used.
+
+    Until then, its updates are not paid for.
+    """
+
+    def __init__(self, cls):
+        self.cls = cls
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, manager, owner):
+        if manager is None:
+            return self
+        stat = self.cls(manager)
+        manager.__dict__[self.name] = stat
+        return stat
 
 
 class GraphManager(Partializable):
     """Structure to hold information about graphs and modify them.
 
     Attributes are updated incrementally when graph mutations are committed.
+    The edges that are added or removed by a mutation are given to the
+    statistics in a single batch through the `mod_edges` event, after
+    which `add_edge` and `drop_edge` are fired for each edge.
 
     Properties are updated incrementally when possible, but may be invalidated
     when graph dependencies change. In that case they will be recomputed lazily
     the next time they are requested.
 
+    Each statistic is only created and maintained from the first time it is
+    accessed, so that a manager only pays for the information it is asked.
+
     Attributes:
         all_nodes:
             Set of all nodes in all graphs managed by this GraphManager.
@@ -449,7 +763,8 @@ class GraphManager(Partializable):
             Map each graph to the set of nodes that belong to it.
 
         uses:
-            Map each node to the set of nodes that point to it.
+            Map each node to the (node, key) pairs of the edges that
+            point to it (see `Uses`).
 
         free_variables_direct:
             Map each graph to its free variables.
@@ -478,6 +793,23 @@ class GraphManager(Partializable):
 
     """
 
+    nodes = _Statistic(NodesStatistic)
+    constants = _Statistic(ConstantsStatistic)
+    free_variables_direct = _Statistic(FVDirectStatistic)
+    graph_constants = _Statistic(GraphConstantsStatistic)
+    graphs_used = _Statistic(GraphsUsedStatistic)
+    graph_users = _Statistic(GraphUsersStatistic)
+    graph_dependencies_direct = _Statistic(GDepDirectStatistic)
+    graph_dependencies_prox = _Statistic(GDepProxStatistic)
+
+    _graph_dependencies_total = _Statistic(GDepTotalStatistic)
+    _parents = _Statistic(ParentStatistic)
+    _children = _Statistic(ChildrenStatistic)
+    _scopes = _Statistic(ScopeStatistic)
+    _free_variables_total = _Statistic(FVTotalStatistic)
+    _graphs_reachable = _Statistic(GraphsReachableStatistic)
+    _recursive = _Statistic(RecursiveStatistic)
+
     def __init__(self, *roots, manage=True):
         """Initialize the GraphManager."""
         self.roots = roots
@@ -496,36 +828,30 @@ class GraphManager(Partializable):
             drop_graph=None,
             add_edge=None,
             drop_edge=None,
+            mod_edges=None,
+            mod_graphs_used=None,
             invalidate_nesting=None,
         )
         roots = set(self.roots) if self.roots else set()
         self.roots = set()
         self.graphs = set()
         self.all_nodes = set()
-        self.uses = defaultdict(set)
-
-        self.nodes = NodesStatistic(self)
-        self.constants = ConstantsStatistic(self)
-        self.free_variables_direct = FVDirectStatistic(self)
-        self.graph_constants = GraphConstantsStatistic(self)
-        self.graphs_used = GraphsUsedStatistic(self)
-        self.graph_users = GraphUsersStatistic(self)
-        self.graph_dependencies_direct = GDepDirectStatistic(self)
-        self.graph_dependencies_prox = GDepProxStatistic(self)
-
-        self._graph_dependencies_total = GDepTotalStatistic(self)
-        self._parents = ParentStatistic(self)
-        self._children = ChildrenStatistic(self)
-        self._scopes = ScopeStatistic(self)
-        self._free_variables_total = FVTotalStatistic(self)
-        self._graphs_reachable = GraphsReachableStatistic(self)
-        self._recursive = RecursiveStatistic(self)
+        self.uses = Uses()
+        self._edges = []
+
+        for name, attr in vars(GraphManager).items():
+            if isinstance(attr, _Statistic):
+                self.__dict__.pop(name, None)
 
         for root in roots:
             self.add_graph(root, root=True)
 
     def add_graph(self, graph, root=False):
         """Add a graph to this manager, optionally as a root graph."""
+        self._add_graph(graph, root)
+        self._flush_edges()
+
+    def _add_graph(self, graph, root=False):
         if root:
             self.roots.add(graph)
         if graph in self.graphs:
@@ -567,6 +893,7 @@ class GraphManager(Partializable):
 
         while todo:
             graph = todo.pop()
+            self._flush_edges()
 
             if graph in self.roots:
                 continue
@@ -579,13 +906,25 @@ class GraphManager(Partializable):
 
             todo |= self._maybe_drop_nodes({graph.return_})
 
+        self._flush_edges()
         for g in dropped:
+            if not self._nesting_leaf(g):
+                self.events.invalidate_nesting()
             self.events.drop_graph(g)
             self.all_nodes -= set(g.parameters)
             self.graphs.remove(g)
             if g._manager is self:
                 g._manager = None
 
+    def _nesting_leaf(self, graph):
+        """Whether graph is at the top level and contains no other graph.
+
+        Dropping such a graph does not change the nesting of the others.
+        """
+        parents = self.__dict__.get('_parents')
+        return parents is not None and parents.valid \
+            and parents[graph] is None and graph not in parents.values()
+
     def _process_edge(self, node, key, inp, direction):
         """Add/remove an edge between two nodes.
 
@@ -599,15 +938,31 @@ class GraphManager(Partializable):
                 # It's possible that we already got here when we
                 # dropped a graph.
                 return  # pragma: no cover
-            self.uses[inp].remove((node, key))
-            self.events.drop_edge(node, key, inp)
+            self.uses.remove(inp, (node, key))
         else:
             if inp.graph is not None:
-                self.add_graph(inp.graph)
+                self._add_graph(inp.graph)
             if inp.is_constant_graph():
-                self.add_graph(inp.value)
-            self.uses[inp].add((node, key))
-            self.events.add_edge(node, key, inp)
+                self._add_graph(inp.value)
+            self.uses.add(inp, (node, key))
+        self._edges.append((node, key, inp, direction))
+
+    def _flush_edges(self):
+        """Update the statistics with the edges processed since last time."""
+        edges = self._edges
+        if not edges:
+            return
+        # A statistic that is created by a handler must know that these
+        # edges will be given to it, so they are only cleared afterwards.
+        self.events.mod_edges(edges)
+        self._edges = []
+        add_edge = self.events.add_edge
+        drop_edge = self.events.drop_edge
+        for node, key, inp, direction in edges:
+            if direction == 1:
+                add_edge(node, key, inp)
+            else:
+                drop_edge(node, key, inp)
 
     def _process_inputs(self, node, direction):
         """Process the inputs of a newly [dis]connected node.
@@ -637,7 +992,7 @@ class GraphManager(Partializable):
         for node in acq:
             g = node.graph
             if g is not None:
-                self.add_graph(g)
+                self._add_graph(g)
             self.events.add_node(node)
             self._process_inputs(node, 1)
 
@@ -798,6 +1153,7 @@ class GraphManager(Partializable):
         maybe_drop_graphs = self._maybe_drop_nodes(rms - adds)
 
         self._maybe_drop_graphs(maybe_drop_graphs)
+        self._flush_edges()
 
 
 class GraphTransaction:
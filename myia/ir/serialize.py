@@ -0,0 +1,710 @@
+"""Binary serialization of graphs.
+
+A file starts with `MAGIC` and the version of the format, followed by the
+graphs that the saved value refers to and then by the value itself.
+
+* All the graphs get an index, so that they can be created first.
+* Every node that is reachable from them is then written after its inputs,
+  with its graph, inputs or value, inferred properties and name.
+* Each graph is then given its parameters, output, flags and transforms.
+
+The other values are written as a tag byte followed by their contents.
+Strings and types are only written once, and are referenced by their
+position afterwards.
+
+Types from `myia.dtype`, primitives from `myia.prim.ops` and a few other
+objects are referenced by stable IDs, which are their index in the tables
+below. These tables must only be appended to, and `FORMAT_VERSION` must be
+increased when the encoding changes, so that the files written by other
+versions are rejected instead of being misread.
+
+Python functions and classes are saved by name and imported when they are
+loaded, so only files from a trusted source should be loaded.
+"""
+
+import hashlib
+import importlib
+import io
+import struct
+
+import numpy
+
+from .. import dtype
+from ..prim import ops as primops, Primitive
+from ..utils import ModuleNamespace, Named, UNKNOWN
+
+from .anf import Apply, Constant, Graph, Parameter
+
+
+MAGIC = b'MYIA'
+FORMAT_VERSION = 1
+
+
+_DTYPE_IDS = (
+    'Type', 'Object', 'Bool', 'Number', 'Float', 'Int', 'UInt', 'List',
+    'Class', 'Tuple', 'Array', 'Function', 'TypeType', 'Problem',
+    'External',
+)
+
+
+_PRIMITIVE_IDS = (
+    'scalar_add', 'scalar_sub', 'scalar_mul', 'scalar_div', 'scalar_mod',
+    'scalar_pow', 'scalar_uadd', 'scalar_usub', 'scalar_exp', 'scalar_log',
+    'scalar_sin', 'scalar_cos', 'scalar_tan', 'scalar_eq', 'scalar_lt',
+    'scalar_gt', 'scalar_ne', 'scalar_le', 'scalar_ge', 'bool_not',
+    'bool_and', 'bool_or', 'typeof', 'hastype', 'make_tuple', 'tail',
+    'tuple_getitem', 'list_getitem', 'array_getitem', 'tuple_setitem',
+    'list_setitem', 'array_setitem', 'getattr', 'setattr', 'tuple_len',
+    'list_len', 'array_len', 'scalar_to_array', 'broadcast_shape', 'shape',
+    'array_map', 'array_map_into', 'array_scan', 'array_reduce',
+    'distribute', 'reshape', 'dot', 'if_', 'switch', 'return_',
+    'scalar_cast', 'list_map', 'identity', 'resolve', 'partial',
+    'make_record',
+)
+
+
+# Objects that are saved by reference. The instances of the classes in
+# this table are saved with the values of their attributes.
+_GLOBAL_IDS = (
+    'myia.utils.misc.UNKNOWN',
+    'myia.infer.utils.ANYTHING',
+    'myia.prim.shape_inferrers.NOSHAPE',
+    'myia.prim.shape_inferrers.TupleShape',
+    'myia.prim.shape_inferrers.ListShape',
+    'myia.prim.shape_inferrers.ClassShape',
+    'myia.specialize.UNKNOWN',
+    'myia.specialize.DEAD',
+    'myia.specialize.POLY',
+    'myia.specialize.INACCESSIBLE',
+    'myia.specialize.AMBIGUOUS',
+)
+
+
+(_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _BYTES, _TUPLE, _LIST, _DICT,
+ _ARRAY, _NPSCALAR, _REF, _DTYPE, _PRIMITIVE, _GLOBAL, _RECORD, _PYGLOBAL,
+ _NAMED, _CLASSTAG, _NAMESPACE, _GRAPH) = range(22)
+
+_APPLY, _PARAMETER, _CONSTANT = range(3)
+
+
+class SerializationError(Exception):
+    """Raised when a value can't be saved or a file can't be read."""
+
+
+def _resolve(module, qualname):
+    obj = importlib.import_module(module)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+_tables = None
+
+
+def _get_tables():
+    # Return the stable ID tables as (objects, ids) pairs, importing the
+    # modules they refer to the first time.
+    global _tables
+    if _tables is None:
+        dtypes = [getattr(dtype, name) for name in _DTYPE_IDS]
+        prims = [getattr(primops, name) for name in _PRIMITIVE_IDS]
+        glob = [_resolve(*path.rsplit('.', 1)) for path in _GLOBAL_IDS]
+        _tables = tuple((objs, {obj: i for i, obj in enumerate(objs)})
+                        for objs in (dtypes, prims, glob))
+    return _tables
+
+
+def _graphs_in(value):
+    # Yield the graphs in a value or in the containers it is made of.
+    if isinstance(value, Graph):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for x in value:
+            yield from _graphs_in(x)
+    elif isinstance(value, dict):
+        for x in value.values():
+            yield from _graphs_in(x)
+
+
+class _Writer:
+    """Encode a value and the graphs it refers to."""
+
+    def __init__(self, file):
+        self.file = file
+        self.memo = {}
+        self.graphs = {}
+        self.nodes = {}
+        self.order = []
+        self.dtypes, self.prims, self.globals = \
+            [ids for _, ids in _get_tables()]
+
+    def byte(self, b):
+        self.file.write(bytes((b,)))
+
+    def varint(self, n):
+        out = bytearray()
+        while n >= 0x80:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+        self.file.write(out)
+
+    def raw(self, b):
+        self.varint(len(b))
+        self.file.write(b)
+
+    def _memoized(self, key):
+        # Write a reference if key was seen before, otherwise return False.
+        idx = self.memo.get(key)
+        if idx is None:
+            return False
+        self.byte(_REF)
+        self.varint(idx)
+        return True
+
+    def _remember(self, key):
+        self.memo[key] = len(self.memo)
+
+    def value(self, v):
+        t = type(v)
+        if v is None:
+            self.byte(_NONE)
+        elif t is bool:
+            self.byte(_TRUE if v else _FALSE)
+        elif t is int:
+            self.byte(_INT)
+            self.varint(2 * v if v >= 0 else -2 * v - 1)
+        elif t is float:
+            self.byte(_FLOAT)
+            self.file.write(struct.pack('<d', v))
+        elif t is str:
+            if not self._memoized(('str', v)):
+                self.byte(_STR)
+                self.raw(v.encode('utf8'))
+                self._remember(('str', v))
+        elif t is bytes:
+            self.byte(_BYTES)
+            self.raw(v)
+        elif t in (tuple, list):
+            self.byte(_TUPLE if t is tuple else _LIST)
+            self.varint(len(v))
+            for x in v:
+                self.value(x)
+        elif t is dict:
+            self.byte(_DICT)
+            self.varint(len(v))
+            for k, x in v.items():
+                self.value(k)
+                self.value(x)
+        elif t is numpy.ndarray:
+            if v.dtype.hasobject:
+                raise SerializationError(f'Cannot serialize {v!r}')
+            self.byte(_ARRAY)
+            self.value(v.dtype.str)
+            self.value(v.shape)
+            self.raw(numpy.ascontiguousarray(v).tobytes())
+        elif isinstance(v, numpy.generic):
+            self.byte(_NPSCALAR)
+            self.value(v.dtype.str)
+            self.raw(v.tobytes())
+        elif isinstance(v, Graph):
+            self.byte(_GRAPH)
+            self.varint(self.graphs[v])
+        elif isinstance(v, Primitive):
+            if v not in self.prims:
+                raise SerializationError(f'Primitive {v} has no stable ID')
+            self.byte(_PRIMITIVE)
+            self.varint(self.prims[v])
+        elif dtype.ismyiatype(v):
+            self.dtype(v)
+        elif isinstance(v, (Named, type)) and v in self.globals:
+            self.byte(_GLOBAL)
+            self.varint(self.globals[v])
+        elif t in self.globals:
+            self.byte(_RECORD)
+            self.varint(self.globals[t])
+            if hasattr(t, '__slots__'):
+                self.value(tuple(getattr(v, name) for name in t.__slots__))
+            else:
+                self.value(vars(v))
+        elif isinstance(v, ModuleNamespace):
+            self.byte(_NAMESPACE)
+            self.value(v.label)
+        elif isinstance(v, Named):
+            self.named(v)
+        elif hasattr(v, '__module__') and hasattr(v, '__qualname__'):
+            self.pyglobal(v)
+        else:
+            raise SerializationError(f'Cannot serialize {v!r}')
+
+    def dtype(self, t):
+        if self._memoized(('dtype', t)):
+            return
+        if t.generic not in self.dtypes:
+            raise SerializationError(f'Type {t} has no stable ID')
+        params = t._params
+        if t.generic is dtype.Class \
+                and params['tag'] in dtype.tag_to_dataclass:
+            # The methods are those of the dataclass, which may not be
+            # importable by name.
+            params = dict(params, methods=None)
+        self.byte(_DTYPE)
+        self.varint(self.dtypes[t.generic])
+        self.value(params)
+        self._remember(('dtype', t))
+
+    def named(self, v):
+        dc = dtype.tag_to_dataclass.get(v)
+        if dc is not None:
+            # The tag of a Class made from a dataclass must be the same
+            # object as the one used by pytype_to_myiatype.
+            self.byte(_CLASSTAG)
+            self.pyglobal(dc)
+        elif not self._memoized(('named', id(v))):
+            self.byte(_NAMED)
+            self.value(v.name)
+            self._remember(('named', id(v)))
+
+    def pyglobal(self, v):
+        module, qualname = v.__module__, v.__qualname__
+        try:
+            ok = _resolve(module, qualname) is v
+        except (ImportError, AttributeError):
+            ok = False
+        if not ok:
+            raise SerializationError(
+                f'Cannot serialize {v!r}, which cannot be imported'
+                f' as {module}.{qualname}'
+            )
+        self.byte(_PYGLOBAL)
+        self.value(module)
+        self.value(qualname)
+
+    def collect(self, root):
+        # Give an index to every graph and node reachable from root, and
+        # sort the nodes so that inputs come before the nodes that use them.
+        todo = []
+
+        def add_graph(g):
+            if g not in self.graphs:
+                self.graphs[g] = len(self.graphs)
+                todo.append(g)
+
+        for g in _graphs_in(root):
+            add_graph(g)
+        while todo:
+            g = todo.pop()
+            for x in _graphs_in([g.flags, g.transforms]):
+                add_graph(x)
+            stack = [(p, False) for p in g.parameters]
+            if g.return_ is not None:
+                stack.append((g.return_, False))
+            while stack:
+                node, ready = stack.pop()
+                if node in self.nodes:
+                    continue
+                if ready:
+                    self.nodes[node] = len(self.order)
+                    self.order.append(node)
+                    if node.graph is not None:
+                        add_graph(node.graph)
+                    if node.is_constant():
+                        for x in _graphs_in(node.value):
+                            add_graph(x)
+                else:
+                    stack.append((node, True))
+                    stack.extend((inp, False) for inp in reversed(node.inputs)
+                                 if inp not in self.nodes)
+
+    def node(self, node):
+        if node.is_apply():
+            self.byte(_APPLY)
+            self.varint(self.graphs[node.graph])
+            self.varint(len(node.inputs))
+            for inp in node.inputs:
+                self.varint(self.nodes[inp])
+        elif node.is_parameter():
+            self.byte(_PARAMETER)
+            self.varint(self.graphs[node.graph])
+        elif node.is_constant():
+            self.byte(_CONSTANT)
+            self.value(node.value)
+        else:
+            raise SerializationError(f'Cannot serialize {node!r}')
+        inf = node.inferred
+        self.value(inf.type)
+        self.inferred(inf.shape)
+        self.inferred(inf.extra)
+        self.value(node.debug.name)
+
+    def inferred(self, v):
+        # The inferrers of functions refer to the state of the engine that
+        # inferred them and are not kept.
+        from ..infer import Inferrer
+        if isinstance(v, Inferrer):
+            v = UNKNOWN
+        elif isinstance(v, dict):
+            v = {k: UNKNOWN if isinstance(x, Inferrer) else x
+                 for k, x in v.items()}
+        self.value(v)
+
+    def graph(self, g):
+        self.value(g.debug.name)
+        self.value(g.flags)
+        self.value(g.transforms)
+        self.varint(len(g.parameters))
+        for p in g.parameters:
+            self.varint(self.nodes[p])
+        self.varint(0 if g.return_ is None else self.nodes[g.return_] + 1)
+
+    def dump(self, root):
+        self.file.write(MAGIC)
+        self.varint(FORMAT_VERSION)
+        self.collect(root)
+        self.varint(len(self.graphs))
+        self.varint(len(self.order))
+        for node in self.order:
+            self.node(node)
+        for g in self.graphs:
+            self.graph(g)
+        self.value(root)
+
+
+class _Reader:
+    """Decode what _Writer encodes."""
+
+    def __init__(self, file):
+        self.file = file
+        self.memo = []
+        self.graphs = []
+        self.nodes = []
+        self.dtypes, self.prims, self.globals = \
+            [objs for objs, _ in _get_tables()]
+
+    def read(self, n):
+        data = self.file.read(n)
+        if len(data) != n:
+            raise SerializationError('Unexpected end of data')
+        return data
+
+    def byte(self):
+        return self.read(1)[0]
+
+    def varint(self):
+        n = 0
+        shift = 0
+        while True:
+            b = self.byte()
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def raw(self):
+        return self.read(self.varint())
+
+    def value(self):
+        tag = self.byte()
+        if tag == _NONE:
+            return None
+        elif tag == _FALSE:
+            return False
+        elif tag == _TRUE:
+            return True
+        elif tag == _INT:
+            z = self.varint()
+            return z >> 1 if z % 2 == 0 else -((z + 1) >> 1)
+        elif tag == _FLOAT:
+            return struct.unpack('<d', self.read(8))[0]
+        elif tag == _STR:
+            res = self.raw().decode('utf8')
+        elif tag == _BYTES:
+            return self.raw()
+        elif tag in (_TUPLE, _LIST):
+            items = [self.value() for _ in range(self.varint())]
+            return tuple(items) if tag == _TUPLE else items
+        elif tag == _DICT:
+            res = {}
+            for _ in range(self.varint()):
+                k = self.value()
+                res[k] = self.value()
+            return res
+        elif tag == _ARRAY:
+            dt = self.value()
+            shape = self.value()
+            return numpy.frombuffer(self.raw(), dt).reshape(shape).copy()
+        elif tag == _NPSCALAR:
+            dt = self.value()
+            return numpy.frombuffer(self.raw(), dt)[0]
+        elif tag == _REF:
+            return self.memo[self.varint()]
+        elif tag == _GRAPH:
+            return self.graphs[self.varint()]
+        elif tag == _PRIMITIVE:
+            return self.prims[self.varint()]
+        elif tag == _DTYPE:
+            generic = self.dtypes[self.varint()]
+            params = self.value()
+            if params is None:
+                res = generic
+            else:
+                if generic is dtype.Class and params['methods'] is None:
+                    dc = dtype.tag_to_dataclass[params['tag']]
+                    params['methods'] = dtype.pytype_to_myiatype(dc).methods
+                res = generic.make_subtype(**params)
+        elif tag == _GLOBAL:
+            return self.globals[self.varint()]
+        elif tag == _RECORD:
+            cls = self.globals[self.varint()]
+            state = self.value()
+            obj = cls.__new__(cls)
+            if hasattr(cls, '__slots__'):
+                for name, x in zip(cls.__slots__, state):
+                    setattr(obj, name, x)
+            else:
+                vars(obj).update(state)
+            return obj
+        elif tag == _PYGLOBAL:
+            module = self.value()
+            return _resolve(module, self.value())
+        elif tag == _NAMED:
+            res = Named(self.value())
+        elif tag == _CLASSTAG:
+            return dtype.pytype_to_myiatype(self.value()).tag
+        elif tag == _NAMESPACE:
+            return ModuleNamespace(self.value())
+        else:
+            raise SerializationError(f'Invalid tag: {tag}')
+        self.memo.append(res)
+        return res
+
+    def node(self):
+        kind = self.byte()
+        if kind == _APPLY:
+            g = self.graphs[self.varint()]
+            inputs = [self.nodes[self.varint()] for _ in range(self.varint())]
+            node = Apply(inputs, g)
+        elif kind == _PARAMETER:
+            node = Parameter(self.graphs[self.varint()])
+        elif kind == _CONSTANT:
+            node = Constant(self.value())
+        else:
+            raise SerializationError(f'Invalid node kind: {kind}')
+        inf = node.inferred
+        inf.type = self.value()
+        inf.shape = self.value()
+        inf.extra = self.value()
+        name = self.value()
+        if name is not None:
+            node.debug.name = name
+        self.nodes.append(node)
+
+    def graph(self, g):
+        name = self.value()
+        if name is not None:
+            g.debug.name = name
+        g.flags = self.value()
+        g.transforms = self.value()
+        g.parameters = [self.nodes[self.varint()]
+                        for _ in range(self.varint())]
+        ret = self.varint()
+        g.return_ = self.nodes[ret - 1] if ret else None
+
+    def load(self):
+        if self.read(len(MAGIC)) != MAGIC:
+            raise SerializationError('Not a serialized Myia value')
+        version = self.varint()
+        if version != FORMAT_VERSION:
+            raise SerializationError(
+                f'Unsupported format version {version}'
+                f' (expected {FORMAT_VERSION})'
+            )
+        self.graphs = [Graph() for _ in range(self.varint())]
+        for _ in range(self.varint()):
+            self.node()
+        for g in self.graphs:
+            self.graph(g)
+        return self.value()
+
+
+# Tag for the objects that the hasher identifies by their id, which is not
+# part of the serialization format.
+_OBJECT = 255
+
+
+class _Hasher(_Writer):
+    """Encode a graph canonically, for graph_hash.
+
+    The encoding is the same as _Writer's, except that constants are
+    written where they are used instead of being shared, names are left
+    out, and only the given inferred properties are written.
+    """
+
+    def __init__(self, properties, opaque):
+        super().__init__(io.BytesIO())
+        self.properties = properties
+        self.opaque = opaque
+
+    def value(self, v):
+        if isinstance(v, Graph) and v not in self.graphs:
+            self.byte(_OBJECT)
+            self.varint(id(v))
+            return
+        try:
+            super().value(v)
+        except SerializationError:
+            self.byte(_OBJECT)
+            self.varint(id(v))
+
+    def collect(self, root):
+        todo = []
+
+        def add_graph(g):
+            if g not in self.graphs and (g is root or self.opaque is None
+                                         or not self.opaque(g)):
+                self.graphs[g] = len(self.graphs)
+                todo.append(g)
+
+        add_graph(root)
+        while todo:
+            g = todo.pop()
+            for x in _graphs_in([g.flags, g.transforms]):
+                add_graph(x)
+            stack = [(p, False) for p in g.parameters]
+            if g.return_ is not None:
+                stack.append((g.return_, False))
+            while stack:
+                node, ready = stack.pop()
+                if node in self.nodes:
+                    continue
+                if node.is_constant():
+                    for x in _graphs_in(node.value):
+                        add_graph(x)
+                    continue
+                if node.graph is not g:
+                    add_graph(node.graph)
+                    if node.graph not in self.graphs:
+                        continue
+                if ready:
+                    self.nodes[node] = len(self.order)
+                    self.order.append(node)
+                else:
+                    stack.append((node, True))
+                    stack.extend((inp, False) for inp in reversed(node.inputs)
+                                 if inp not in self.nodes)
+
+    def ref(self, node):
+        if node.is_constant():
+            self.byte(_CONSTANT)
+            self.value(node.value)
+            self.properties_of(node)
+        elif node in self.nodes:
+            self.byte(_APPLY)
+            self.varint(self.nodes[node])
+        else:
+            self.byte(_OBJECT)
+            self.varint(id(node))
+
+    def properties_of(self, node):
+        for prop in self.properties:
+            self.inferred(node.inferred[prop])
+
+    def node(self, node):
+        if node.is_apply():
+            self.byte(_APPLY)
+            self.varint(self.graphs[node.graph])
+            self.varint(len(node.inputs))
+            for inp in node.inputs:
+                self.ref(inp)
+        else:
+            self.byte(_PARAMETER)
+            self.varint(self.graphs[node.graph])
+        self.properties_of(node)
+
+    def graph(self, g):
+        self.value(g.flags)
+        self.value(g.transforms)
+        self.varint(len(g.parameters))
+        for p in g.parameters:
+            self.ref(p)
+        if g.return_ is None:
+            self.byte(_NONE)
+        else:
+            self.ref(g.return_)
+
+
+def graph_hash(graph, properties=('type',), opaque=None):
+    """Return a canonical structural hash of a graph, as a hex string.
+
+    Two graphs have the same hash if they have the same structure, with
+    the same primitives, constants and nested graphs, and if the inferred
+    properties given in `properties` are equal for all their nodes. The
+    identity and the names of the nodes do not matter. Graphs used by the
+    graph are included in the hash, in the same way.
+
+    The hash is the SHA-256 of an encoding of the graph that uses the same
+    stable IDs as `dump`, so it is the same in all processes and can be
+    used as the key of a persistent cache. Constants that `dump` cannot
+    save are identified by their id, in which case the hash is only
+    meaningful in the current process.
+
+    Arguments:
+        graph: The graph to hash.
+        properties: The inferred properties that must match.
+        opaque: A function that tells whether a graph that is used by
+            graph is identified by its id instead of being hashed, which
+            is faster but only meaningful in the current process.
+
+    """
+    hasher = _Hasher(properties, opaque)
+    hasher.dump(graph)
+    return hashlib.sha256(hasher.file.getvalue()).hexdigest()
+
+
+def dump(value, file):
+    """Write a value and the graphs it contains to a binary file.
+
+    The value may be a Graph or any combination of tuples, lists and dicts
+    of graphs and other serializable values, like the constants and the
+    inferred properties of the nodes of a graph after any step of the
+    standard pipelines. Each graph is saved with its parameters, nodes,
+    inferred properties, flags and transforms, as well as all the graphs
+    it uses or is nested in.
+
+    Python functions and classes are saved by name, and must be importable
+    under that name. Other objects raise a SerializationError.
+    """
+    _Writer(file).dump(value)
+
+
+def dumps(value):
+    """Serialize a value and the graphs it contains into bytes.
+
+    See `dump`.
+    """
+    buf = io.BytesIO()
+    dump(value, buf)
+    return buf.getvalue()
+
+
+def load(file):
+    """Read a value written by `dump` from a binary file.
+
+    The graphs that are read are new graphs without a manager.
+
+    Warning:
+        Like `pickle`, this must only be used on trusted data. Python
+        functions, classes and namespaces are loaded by importing the
+        module and getting the attributes that are named in the file,
+        which can run arbitrary code.
+
+    """
+    return _Reader(file).load()
+
+
+def loads(data):
+    """Read a value serialized by `dumps`.
+
+    See `load`, which must also only be used on trusted data.
+    """
+    return load(io.BytesIO(data))
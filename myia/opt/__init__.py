@@ -3,7 +3,7 @@
 from .opt import (  # noqa
     VarNode, sexp_to_node, sexp_to_graph,
     PatternSubstitutionOptimization,
-    pattern_replacer,
+    pattern_replacer, node_key,
     PatternEquilibriumOptimizer
 )
 
@@ -11,6 +11,18 @@ from .cse import (  # noqa
     cse, CSE
 )
 
+from .dead import (  # noqa
+    elim_unused_parameters, ElimUnusedParameters
+)
+
+from .licm import (  # noqa
+    hoist_invariants, HoistInvariants
+)
+
+from .inplace import (  # noqa
+    mark_inplace, only_reads, MarkInplace
+)
+
 from .clean import (  # noqa
     erase_class
 )
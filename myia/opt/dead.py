@@ -0,0 +1,124 @@
+"""Dead code elimination across graphs."""
+
+
+from ..dtype import Function, ismyiatype
+from ..ir import Apply, Constant
+from ..prim import ops as P
+
+
+def _call_sites(g, manager):
+    # Return a list of (node, offset) for each site where g is called or
+    # partially applied, offset being the index of the first argument in
+    # node.inputs, or None if g is used in any other way.
+    sites = []
+    for ct in manager.graph_constants.get(g, ()):
+        for node, key in manager.uses.get(ct, ()):
+            if key == 0:
+                sites.append((node, 1))
+            elif key == 1 and node.inputs[0].is_constant() \
+                    and node.inputs[0].value is P.partial:
+                sites.append((node, 2))
+            else:
+                return None
+    return sites
+
+
+def _prune_type(t, keep):
+    # Remove the arguments that are not kept from a Function type.
+    if not ismyiatype(t, Function):
+        return t
+    args = [a for i, a in enumerate(t.arguments) if i in keep]
+    return Function[args, t.retval]
+
+
+def _prune_partial_type(t, keep):
+    # Same as _prune_type, for the type of partial(g, ...)
+    if not ismyiatype(t, Function):
+        return t
+    gt, *args = t.arguments
+    args = [a for i, a in enumerate(args) if i in keep]
+    return Function[[_prune_type(gt, keep), *args], t.retval]
+
+
+def _unused_parameters(g, sites, manager):
+    # Indexes of the parameters of g that can be removed
+    unused = {i for i, p in enumerate(g.parameters)
+              if not manager.uses.get(p)}
+    for node, offset in sites:
+        nargs = len(node.inputs) - offset
+        if offset == 1 and nargs != len(g.parameters):
+            return set()
+        # The arguments that are not given to partial will be given
+        # by an unknown call site, so we can't remove them.
+        unused &= set(range(nargs))
+    return unused
+
+
+def elim_unused_parameters(root, manager):
+    """Remove the parameters that are not used from graphs.
+
+    The graphs that are exported (root and the manager's roots) keep their
+    signature, as well as graphs that are used other than through calls
+    or partial applications. For the other graphs, all call sites and
+    `partial` applications are rewritten to drop the arguments that
+    correspond to removed parameters. Since these arguments may have been
+    the only use of a parameter in the caller, this is repeated until
+    there are no changes.
+
+    Returns:
+        The number of parameters that were removed.
+
+    """
+    manager.add_graph(root)
+    exported = {root, *manager.roots}
+    total = 0
+    while True:
+        changes = 0
+        for g in list(manager.graphs):
+            if g in exported or g not in manager.graphs:
+                continue
+            sites = _call_sites(g, manager)
+            if sites is None:
+                continue
+            unused = _unused_parameters(g, sites, manager)
+            if not unused:
+                continue
+            keep = {i for i in range(len(g.parameters)) if i not in unused}
+
+            manager.set_parameters(g, [p for i, p in enumerate(g.parameters)
+                                       if i in keep])
+            for ct in manager.graph_constants[g]:
+                ct.type = _prune_type(ct.type, keep)
+
+            for node, offset in sites:
+                if node not in manager.all_nodes:
+                    continue
+                # The inputs are read here and not in _call_sites, because
+                # a call site may be an argument of another.
+                fn, *args = node.inputs
+                if offset == 2:
+                    fn = Constant(P.partial)
+                    fn.type = _prune_partial_type(node.inputs[0].type, keep)
+                args = [*args[:offset - 1],
+                        *[inp for i, inp in enumerate(args[offset - 1:])
+                          if i in keep]]
+                new_node = Apply([fn, *args], node.graph)
+                new_node.type = node.type
+                manager.replace(node, new_node)
+
+            changes += len(unused)
+        if not changes:
+            return total
+        total += changes
+
+
+class ElimUnusedParameters:
+    """Remove the parameters that are not used from graphs."""
+
+    def __init__(self, optimizer):
+        """Initialize ElimUnusedParameters."""
+        self.optimizer = optimizer
+
+    def __call__(self, root):
+        """Remove unused parameters from the graphs used by root."""
+        elim_unused_parameters(root, self.optimizer.resources.manager)
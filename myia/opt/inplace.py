@@ -0,0 +1,128 @@
+"""Reuse of dead array buffers by elementwise operations."""
+
+
+from ..dtype import Array, Function, ismyiatype
+from ..graph_utils import dfs
+from ..ir import Apply, Constant, freevars_boundary, succ_incoming
+from ..prim import ops as P
+
+
+# Primitives that return an array in a buffer that nothing else refers to.
+_FreshPrims = frozenset({
+    P.array_map,
+    P.array_map_into,
+    P.array_scan,
+    P.dot,
+})
+
+
+# Primitives that read their array arguments without returning them or a
+# view on them, so that their result stays valid if the arguments are
+# overwritten afterwards.
+_ReadingPrims = frozenset({
+    P.array_map,
+    P.array_map_into,
+    P.array_reduce,
+    P.array_scan,
+    P.dot,
+    P.shape,
+    P.array_len,
+})
+
+
+def _head(node):
+    if node.is_apply() and node.inputs[0].is_constant():
+        return node.inputs[0].value
+    return None
+
+
+def only_reads(user, key):
+    """Whether user reads its key-th input without returning it.
+
+    This is true if the result of user does not contain that input nor
+    a view on it, so that it remains valid if the input's buffer is
+    overwritten after user is computed.
+    """
+    head = _head(user)
+    return head in _ReadingPrims \
+        and not (head is P.array_map_into and key == 1)
+
+
+def _ancestors(node):
+    # The nodes of node.graph that must be computed before node.
+    return set(dfs(node, succ_incoming, freevars_boundary(node.graph, False)))
+
+
+def _dies_at(arg, node, manager, ancestors):
+    # Whether node is the last use of arg, and nothing computed from arg
+    # refers to its buffer after node.
+    if not arg.is_apply() or arg.graph is not node.graph \
+            or _head(arg) not in _FreshPrims:
+        return False
+    for user, key in manager.uses[arg]:
+        if user is node:
+            continue
+        if user.graph is not node.graph or not only_reads(user, key):
+            return False
+        if ancestors is None:
+            ancestors = _ancestors(node)
+        if user not in ancestors:
+            return False
+    return True
+
+
+def _into(node, out):
+    fn, *arrays = node.inputs[1:]
+    map_fn = Constant(P.array_map_into)
+    map_fn.type = Function[[out.type, fn.type, *[a.type for a in arrays]],
+                           node.type]
+    new_node = Apply([map_fn, out, fn, *arrays], node.graph)
+    new_node.type = node.type
+    if 'shape' in node.inferred:
+        new_node.inferred['shape'] = node.inferred['shape']
+    return new_node
+
+
+def mark_inplace(root, manager):
+    """Make elementwise array operations reuse the buffer of a dead input.
+
+    An `array_map` that has an input which is not used after it can write
+    its result in that input's buffer instead of allocating a new one. It
+    is then replaced by `array_map_into(input, fn, *arrays)`. The input
+    must have the same type as the result, it must be a fresh array (not a
+    parameter, a constant or a view on another array), and its other uses
+    must be in the same graph, computed before the `array_map`, and must
+    not return it or a view on it.
+
+    This must run on typed graphs, after the last optimization that could
+    add uses to a node.
+
+    Returns:
+        The number of operations that were made in-place.
+
+    """
+    manager.add_graph(root)
+    count = 0
+    for node in list(manager.all_nodes):
+        if _head(node) is not P.array_map or not ismyiatype(node.type, Array):
+            continue
+        ancestors = None
+        for arg in node.inputs[2:]:
+            if arg.type == node.type \
+                    and _dies_at(arg, node, manager, ancestors):
+                manager.replace(node, _into(node, arg))
+                count += 1
+                break
+    return count
+
+
+class MarkInplace:
+    """Make elementwise array operations reuse the buffer of a dead input."""
+
+    def __init__(self, optimizer):
+        """Initialize MarkInplace."""
+        self.optimizer = optimizer
+
+    def __call__(self, root):
+        """Mark the in-place operations in the graphs used by root."""
+        mark_inplace(root, self.optimizer.resources.manager)
@@ -1,8 +1,13 @@
 """Library of optimizations."""
 
+import numpy
+
+from ..dtype import Array, Function, ismyiatype
 from ..graph_utils import dfs
-from ..ir import succ_incoming, freevars_boundary, Graph, Constant, GraphCloner
+from ..ir import succ_incoming, freevars_boundary, Apply, Graph, Constant, \
+    GraphCloner
 from ..prim import Primitive, ops as P
+from ..prim.py_implementations import py_implementations
 from ..utils import Namespace
 from ..utils.unify import Var, var, SVar
 
@@ -94,10 +99,12 @@ tail_tuple = psub(
 
 # f((a, b, ...), (p, q, ...)) => (f(a, p), f(b, q), ...)
 # For f in the following list:
-_BubbleBinary = primset_var(P.scalar_add)
+_BubbleBinaryPrims = (P.scalar_add,)
+_BubbleBinary = primset_var(*_BubbleBinaryPrims)
 
 
-@pattern_replacer(_BubbleBinary, (P.make_tuple, Xs), (P.make_tuple, Ys))
+@pattern_replacer(_BubbleBinary, (P.make_tuple, Xs), (P.make_tuple, Ys),
+                  interest=_BubbleBinaryPrims)
 def bubble_op_tuple_binary(optimizer, node, equiv):
     """Replace (x, y, ...) + (a, b, ...) => (x + a, y + b, ...)."""
     xs = equiv[Xs]
@@ -156,6 +163,58 @@ elim_identity = psub(
 )
 
 
+####################
+# Constant folding #
+####################
+
+
+# Primitives without side effects that can be evaluated at compile time
+# when all their arguments are constant.
+_FoldablePrims = (
+    P.scalar_add, P.scalar_sub, P.scalar_mul, P.scalar_div, P.scalar_mod,
+    P.scalar_pow, P.scalar_uadd, P.scalar_usub, P.scalar_exp, P.scalar_log,
+    P.scalar_sin, P.scalar_cos, P.scalar_tan,
+    P.scalar_eq, P.scalar_lt, P.scalar_gt, P.scalar_ne, P.scalar_le,
+    P.scalar_ge, P.bool_not, P.bool_and, P.bool_or,
+    P.make_tuple, P.tail, P.tuple_getitem, P.tuple_setitem, P.tuple_len,
+    P.broadcast_shape, P.switch,
+)
+_Foldable = primset_var(*_FoldablePrims)
+
+
+def _is_foldable_value(v):
+    if isinstance(v, tuple):
+        return all(_is_foldable_value(x) for x in v)
+    return isinstance(v, (bool, int, float, numpy.number, numpy.bool_))
+
+
+@pattern_replacer(_Foldable, Cs, interest=_FoldablePrims)
+def constant_fold(optimizer, node, equiv):
+    """Evaluate a pure primitive on constant arguments.
+
+    The node is left unchanged if the arguments are not scalars or tuples
+    of scalars, or if the evaluation fails.
+    """
+    args = [ct.value for ct in equiv[Cs]]
+    if not all(_is_foldable_value(arg) for arg in args):
+        return node
+    try:
+        value = py_implementations[equiv[_Foldable].value](*args)
+    except Exception:
+        return node
+    return Constant(value)
+
+
+@pattern_replacer(P.shape, X)
+def constant_fold_shape(optimizer, node, equiv):
+    """Replace the shape of an array by a constant if it is fully known."""
+    shp = equiv[X].inferred['shape']
+    if isinstance(shp, tuple) \
+            and all(isinstance(dim, int) for dim in shp):
+        return Constant(shp)
+    return node
+
+
 ######################
 # Branch elimination #
 ######################
@@ -201,6 +260,89 @@ def resolve_globals(optimizer, node, equiv):
     return Constant(res)
 
 
+######################
+# Array optimizations #
+######################
+
+
+@pattern_replacer(P.distribute, X, C)
+def elim_distribute(optimizer, node, equiv):
+    """Remove a distribute to the shape the array already has."""
+    if equiv[X].inferred['shape'] == equiv[C].value:
+        return equiv[X]
+    return node
+
+
+def _typed(node, t):
+    node.type = t
+    return node
+
+
+@pattern_replacer(P.array_map, X, Xs)
+def fuse_array_map(optimizer, node, equiv):
+    """Fuse an array_map on the result of another array_map.
+
+    array_map(f, ..., array_map(g, xs...), ...)
+        => array_map(h, ..., xs..., ...)
+
+    Where h applies g and then f on the scalar elements. The inner
+    array_map must have no other use, so that no work is duplicated. One
+    inner array_map is fused at a time, so chains of several array_map
+    are fused by applying this repeatedly. f and g must be constants,
+    since h refers to them directly.
+    """
+    f = equiv[X]
+    args = equiv[Xs]
+    if not f.is_constant():
+        return node
+    mng = node.graph.manager
+    for i, arg in enumerate(args):
+        if arg.is_apply() and arg.inputs[0].is_constant() \
+                and arg.inputs[0].value is P.array_map \
+                and arg.inputs[1].is_constant() \
+                and len(mng.uses[arg]) == 1:
+            break
+    else:
+        return node
+
+    g, *inner_args = arg.inputs[1:]
+    before, after = args[:i], args[i + 1:]
+    new_args = [*before, *inner_args, *after]
+    typed = ismyiatype(node.type, Array) and ismyiatype(f.type, Function) \
+        and ismyiatype(g.type, Function) \
+        and all(ismyiatype(a.type, Array) for a in new_args)
+
+    fused = Graph()
+    fused.debug.name = 'fused'
+    params = [fused.add_parameter() for _ in new_args]
+    inner_params = params[i:i + len(inner_args)]
+    call_g = fused.apply(Constant(g.value), *inner_params)
+    fused.output = fused.apply(
+        Constant(f.value),
+        *params[:i], call_g, *params[i + len(inner_args):]
+    )
+
+    fn = Constant(fused)
+    map_fn = Constant(P.array_map)
+    if typed:
+        for p, a in zip(params, new_args):
+            p.type = a.type.elements
+        _typed(call_g.inputs[0], g.type)
+        call_g.type = g.type.retval
+        _typed(fused.output.inputs[0], f.type)
+        fused.output.type = f.type.retval
+        ret = fused.return_
+        ret.type = f.type.retval
+        _typed(ret.inputs[0], Function[[ret.type], ret.type])
+        fn.type = Function[[p.type for p in params], f.type.retval]
+        map_fn.type = Function[[fn.type, *[a.type for a in new_args]],
+                               node.type]
+    res = _typed(Apply([map_fn, fn, *new_args], node.graph), node.type)
+    if 'shape' in node.inferred:
+        res.inferred['shape'] = node.inferred['shape']
+    return res
+
+
 ############
 # Inlining #
 ############
@@ -215,7 +357,7 @@ def make_inliner(inline_criterion, check_recursive):
         check_recursive: Check whether a function is possibly recursive
             before inlining it. If it is, don't inline.
     """
-    @pattern_replacer(G, Xs)
+    @pattern_replacer(G, Xs, interest=Graph)
     def inline(optimizer, node, equiv):
         g = equiv[G].value
         args = equiv[Xs]
@@ -262,12 +404,58 @@ def is_unique_use(g, node, args):
     return len(users) == 1 and sum(users.values()) == 1
 
 
+def graph_size(g):
+    """Return the number of applications in g and in the graphs it contains.
+
+    This is the number of nodes that inlining g copies.
+    """
+    return sum(1 for g2 in g.scope for node in g2.nodes if node.is_apply())
+
+
+def make_cost_criterion(max_growth=20, max_size=50,
+                        call_cost=2, constant_bonus=1):
+    """Create an inlining criterion based on a cost model.
+
+    The growth caused by inlining a graph is estimated as its size (see
+    `graph_size`) times its number of uses (from `graph_users`), minus its
+    size, since the graph disappears once all uses are inlined. The
+    following are deduced from it:
+
+    * The cost of each call, since inlining removes it.
+    * A bonus for each constant argument, since inlining it may enable
+      constant folding.
+
+    The graph is inlined if the result is within the growth budget.
+
+    Args:
+        max_growth: The maximal number of nodes that inlining all the uses
+            of a graph may add.
+        max_size: Graphs larger than this are never inlined.
+        call_cost: The cost of a function call, in nodes.
+        constant_bonus: The bonus for each constant argument, in nodes.
+    """
+    def inline_criterion(g, node, args):
+        size = graph_size(g)
+        if size > max_size:
+            return False
+        uses = sum(g.graph_users.values())
+        nconst = sum(1 for arg in args if arg.is_constant())
+        growth = size * (uses - 1) - call_cost * uses \
+            - constant_bonus * nconst
+        return growth <= max_growth
+
+    return inline_criterion
+
+
 inline_trivial = make_inliner(inline_criterion=is_trivial_graph,
                               check_recursive=False)
 
 inline_unique_uses = make_inliner(inline_criterion=is_unique_use,
                                   check_recursive=True)
 
+inline_cost = make_inliner(inline_criterion=make_cost_criterion(),
+                           check_recursive=True)
+
 inline = make_inliner(inline_criterion=None, check_recursive=True)
 
 
@@ -299,7 +487,7 @@ def replace_applicator(optimizer, node, equiv):
 ##########################
 
 
-@pattern_replacer((G, Xs), Ys)
+@pattern_replacer((G, Xs), Ys, interest=Apply)
 def drop_into_call(optimizer, node, equiv):
     """Drop a call into the graph that returns the function.
 
@@ -0,0 +1,175 @@
+"""Loop-invariant code motion."""
+
+
+from ..dtype import Function, ismyiatype
+from ..ir import Apply, Parameter
+from ..prim import ops as P
+
+
+# Pure primitives that can be computed before a loop starts, without
+# causing an error that the loop would not cause. Primitives that can
+# fail on some inputs, such as scalar_div, scalar_cast, broadcast_shape,
+# reshape, distribute or array_map (which may apply any function), are
+# not included.
+_HoistablePrims = frozenset({
+    P.scalar_add, P.scalar_sub, P.scalar_mul, P.scalar_uadd, P.scalar_usub,
+    P.scalar_eq, P.scalar_lt, P.scalar_gt, P.scalar_ne, P.scalar_le,
+    P.scalar_ge, P.bool_not, P.bool_and, P.bool_or,
+    P.make_tuple, P.tail, P.tuple_getitem, P.tuple_len,
+    P.shape, P.array_len, P.scalar_to_array,
+})
+
+
+def _loop_calls(g, manager):
+    # Return (inner, outer), the lists of the calls to g from inside and
+    # outside of its scope, or None if g is used in any other way.
+    scope = manager.scopes[g]
+    inner = []
+    outer = []
+    for ct in manager.graph_constants.get(g, ()):
+        for node, key in manager.uses.get(ct, ()):
+            if key != 0 or len(node.inputs) - 1 != len(g.parameters):
+                return None
+            (inner if node.graph in scope else outer).append(node)
+    return inner, outer
+
+
+def _invariants(g, inner, manager):
+    # Return a function that tells whether a node in the scope of g has
+    # the same value in all the recursive calls to g.
+    scope = manager.scopes[g]
+    memo = {p: all(call.inputs[i + 1] is p for call in inner)
+            for i, p in enumerate(g.parameters)}
+
+    def invariant(node):
+        if node in memo:
+            return memo[node]
+        if node.is_constant_graph():
+            res = manager.parents[node.value] is None
+        elif node.is_constant():
+            res = True
+        elif node.is_apply() and node.graph in scope:
+            fn, *args = node.inputs
+            memo[node] = False
+            res = fn.is_constant() and fn.value in _HoistablePrims \
+                and all(invariant(arg) for arg in args)
+        else:
+            res = False
+        memo[node] = res
+        return res
+
+    return invariant
+
+
+def _copy_expr(node, g, args, site, memo):
+    # Copy the computation of node at site, using args as the parameters
+    # of g.
+    if node in memo:
+        return memo[node]
+    if node.is_parameter():
+        res = args[g.parameters.index(node)]
+    elif node.is_constant():
+        res = node
+    else:
+        res = Apply([_copy_expr(inp, g, args, site, memo)
+                     for inp in node.inputs], site.graph)
+        res.type = node.type
+        if 'shape' in node.inferred:
+            res.inferred['shape'] = node.inferred['shape']
+    memo[node] = res
+    return res
+
+
+def _hoist(g, inner, outer, manager):
+    # Move the maximal invariant computations of g to its callers. Returns
+    # the number of computations that were moved.
+    invariant = _invariants(g, inner, manager)
+    hoisted = []
+    for sub in manager.scopes[g]:
+        for node in manager.nodes[sub]:
+            if node.is_apply() and invariant(node) \
+                    and any(not invariant(user)
+                            for user, _ in manager.uses[node]):
+                hoisted.append(node)
+    if not hoisted:
+        return 0
+
+    new_args = {}
+    for site in outer:
+        memo = {}
+        new_args[site] = [_copy_expr(node, g, site.inputs[1:], site, memo)
+                          for node in hoisted]
+
+    params = []
+    for node in hoisted:
+        p = Parameter(g)
+        p.type = node.type
+        if 'shape' in node.inferred:
+            p.inferred['shape'] = node.inferred['shape']
+        params.append(p)
+    manager.set_parameters(g, g.parameters + params)
+    for ct in manager.graph_constants[g]:
+        if ismyiatype(ct.type, Function):
+            ct.type = Function[[*ct.type.arguments,
+                                *[p.type for p in params]],
+                               ct.type.retval]
+
+    for site in inner + outer:
+        extra = params if site in inner else new_args[site]
+        new_site = Apply([*site.inputs, *extra], site.graph)
+        new_site.type = site.type
+        manager.replace(site, new_site)
+    for node, p in zip(hoisted, params):
+        manager.replace(node, p)
+    return len(hoisted)
+
+
+def hoist_invariants(root, manager):
+    """Move the loop-invariant computations out of recursive graphs.
+
+    The parser turns loops into graphs that call themselves. If such a
+    graph passes one of its parameters unchanged to all its recursive
+    calls, that parameter is invariant, and so is any computation in the
+    graph's scope that only uses pure primitives on invariant parameters
+    and constants. The maximal invariant computations are copied to each
+    call site outside of the graph's scope and given to the graph through
+    new parameters, which the recursive calls pass along unchanged.
+
+    The graphs that are exported (root and the manager's roots) keep their
+    signature, as well as graphs that are used other than through calls.
+    Since the computations that are moved may become invariant in an
+    enclosing loop, this is repeated until there are no changes.
+
+    Returns:
+        The number of computations that were moved.
+
+    """
+    manager.add_graph(root)
+    exported = {root, *manager.roots}
+    total = 0
+    while True:
+        changes = 0
+        for g in list(manager.graphs):
+            if g in exported or g not in manager.graphs:
+                continue
+            calls = _loop_calls(g, manager)
+            if calls is None:
+                continue
+            inner, outer = calls
+            if inner and outer:
+                changes += _hoist(g, inner, outer, manager)
+        if not changes:
+            return total
+        total += changes
+
+
+class HoistInvariants:
+    """Move the loop-invariant computations out of recursive graphs."""
+
+    def __init__(self, optimizer):
+        """Initialize HoistInvariants."""
+        self.optimizer = optimizer
+
+    def __call__(self, root):
+        """Move the loop-invariant computations in the graphs of root."""
+        hoist_invariants(root, self.optimizer.resources.manager)
@@ -1,5 +1,7 @@
 """Graph optimization routines."""
 
+from collections import deque
+
 from ..ir import ANFNode, Apply, Constant, Graph, Special, manage
 from ..utils.unify import Unification, Var
 
@@ -73,11 +75,15 @@ class PatternSubstitutionOptimization:
             A pattern can span multiple graphs if, for example, the root
             of the pattern is in a closure, and some of the leaves are in
             the parent function of that closure.
+        interest: The key (or tuple of keys) of the nodes that the pattern
+            may match, as returned by `node_key`, or None if it may match
+            any node. If False, it is deduced from the head of the pattern.
 
     Attributes:
         pattern: The pattern, converted to Myia's IR.
         replacement: The replacement, converted to Myia's IR.
         name: The name of the optimization.
+        interest: A tuple of node keys, or None.
 
     """
 
@@ -86,7 +92,8 @@ class PatternSubstitutionOptimization:
                  replacement,
                  *,
                  name=None,
-                 multigraph=True):
+                 multigraph=True,
+                 interest=False):
         """Initialize va PatternSubstitutionOptimization."""
         g: Var = Var('RootG')
         self.pattern = sexp_to_node(pattern, g, multigraph)
@@ -96,6 +103,11 @@ class PatternSubstitutionOptimization:
             self.replacement = sexp_to_node(replacement, g)
         self.unif = Unification()
         self.name = name
+        if interest is False:
+            interest = _pattern_key(self.pattern)
+        if interest is not None and not isinstance(interest, tuple):
+            interest = (interest,)
+        self.interest = interest
 
     def __call__(self, optimizer, node):
         """Return a replacement for the node, if the pattern matches.
@@ -120,23 +132,90 @@ class PatternSubstitutionOptimization:
             return None
 
 
-def pattern_replacer(*pattern):
+def pattern_replacer(*pattern, interest=False):
     """Create a PatternSubstitutionOptimization using this function."""
     if len(pattern) == 2 and pattern[0] == 'just':
         pattern = pattern[1]
 
     def deco(f):
-        return PatternSubstitutionOptimization(pattern, f, name=f.__name__)
+        return PatternSubstitutionOptimization(pattern, f, name=f.__name__,
+                                               interest=interest)
     return deco
 
 
+def node_key(node):
+    """Return a key that summarizes what patterns the node may match.
+
+    * For an application of a constant graph, the key is Graph.
+    * For an application of another constant, the key is its value,
+      typically a Primitive.
+    * For an application of an Apply node, the key is Apply.
+    * Otherwise, the key is None.
+    """
+    if node.is_apply():
+        fn = node.inputs[0]
+        if fn.is_constant_graph():
+            return Graph
+        elif fn.is_constant():
+            return fn.value
+        elif fn.is_apply():
+            return Apply
+    return None
+
+
+def _pattern_key(pattern):
+    # Key of the nodes a pattern may match, None meaning any node.
+    if isinstance(pattern, Apply) and pattern.inputs:
+        fn = pattern.inputs[0]
+        if isinstance(fn, VarNode):
+            return None
+        return node_key(pattern)
+    return None
+
+
 class PatternEquilibriumOptimizer:
-    """Apply a set of local pattern optimizations until equilibrium."""
+    """Apply a set of local pattern optimizations until equilibrium.
+
+    The optimizer keeps a worklist of nodes to visit, which initially
+    contains all nodes. When a node is replaced, the new node, its users
+    and its inputs are put back on the worklist, as well as any node that
+    the replacement added to the manager and the remaining uses of any
+    graph that lost a use. Nodes that are not affected by a replacement
+    are therefore not visited again.
+
+    The transformers are indexed by the `interest` attribute they may
+    define (see `node_key`), so that only the transformers that may match
+    a node are tried on it, in the order they were given.
+    """
 
     def __init__(self, *node_transformers, optimizer=None):
         """Initialize a PatternEquilibriumOptimizer."""
         self.node_transformers = node_transformers
         self.optimizer = optimizer
+        self._index = {}
+        self._generic = []
+        for i, transformer in enumerate(node_transformers):
+            interest = getattr(transformer, 'interest', None)
+            if interest is None:
+                self._generic.append(i)
+            else:
+                for key in interest:
+                    self._index.setdefault(key, []).append(i)
+        self._candidates = {}
+
+    def candidates(self, node):
+        """Return the transformers that may match the node, in order."""
+        key = node_key(node)
+        try:
+            return self._candidates[key]
+        except KeyError:
+            idx = sorted(self._generic + self._index.get(key, []))
+            rval = [self.node_transformers[i] for i in idx]
+            self._candidates[key] = rval
+            return rval
+        except TypeError:
+            # Unhashable constant
+            return [self.node_transformers[i] for i in self._generic]
 
     def __call__(self, *graphs):
         """Apply optimizations until equilibrium on given graphs."""
@@ -147,18 +226,47 @@ class PatternEquilibriumOptimizer:
         else:
             mng = manage(*graphs)
 
-        while True:
-            changes = False
-
-            with mng.transact() as tr:
-                for node in list(mng.all_nodes):
-                    for transformer in self.node_transformers:
-                        new = transformer(self.optimizer, node)
-                        if new and new is not node:
-                            new.type = node.type
-                            tr.replace(node, new)
-                            changes = True
-                            break
-
-            if not changes:
-                break
+        todo = deque()
+        pending = set()
+
+        def schedule(node):
+            if node not in pending:
+                pending.add(node)
+                todo.append(node)
+
+        def on_add_node(event, node):
+            schedule(node)
+
+        def on_drop_edge(event, node, key, inp):
+            # Some transformers depend on the number of uses of a graph,
+            # so we revisit the other uses of a graph when one goes away.
+            if inp.is_constant_graph():
+                for ct in mng.graph_constants.get(inp.value, ()):
+                    for user, _ in mng.uses.get(ct, ()):
+                        schedule(user)
+
+        for node in mng.all_nodes:
+            schedule(node)
+
+        mng.events.add_node.register(on_add_node)
+        mng.events.drop_edge.register(on_drop_edge)
+        try:
+            while todo:
+                node = todo.popleft()
+                pending.discard(node)
+                if node not in mng.all_nodes:
+                    continue
+                for transformer in self.candidates(node):
+                    new = transformer(self.optimizer, node)
+                    if new and new is not node:
+                        new.type = node.type
+                        mng.replace(node, new)
+                        schedule(new)
+                        for user, _ in mng.uses.get(new, ()):
+                            schedule(user)
+                        for inp in new.inputs:
+                            schedule(inp)
+                        break
+        finally:
+            mng.events.add_node.remove(on_add_node)
+            mng.events.drop_edge.remove(on_drop_edge)
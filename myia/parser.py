@@ -229,6 +229,7 @@ class Parser:
         else:
             # This is the top-level function, so we set self.graph
             self.graph = function_block.graph
+            function_block.graph.debug.location = self.make_location(node)
 
         function_block.mature()
         function_block.graph.debug.name = node.name
@@ -1,6 +1,7 @@
 """Tools to generate and configure Myia's operation pipeline."""
 
 
+from .info import debug_info
 from .utils import merge, Merge, NS, Partial, Partializable, partition_keywords
 
 
@@ -239,7 +240,16 @@ class _PipelineSlice:
 
         Errors are put in the 'error' key of the result, and the step
         at which an error happened is put in the 'error_step' key.
+
+        If the pipeline has a `debug_info` resource, it tells whether to
+        capture debug information while the steps run (see
+        `myia.info.debug_info`).
         """
+        enabled = getattr(self.pipeline.resources, 'debug_info', None)
+        with debug_info(enabled):
+            return self._run(args)
+
+    def _run(self, args):
         for step in self.pipeline._seq[self.slice]:
             if 'error' in args:
                 break
@@ -88,6 +88,7 @@ scalar_to_array = Primitive('scalar_to_array')
 broadcast_shape = Primitive('broadcast_shape')
 shape = Primitive('shape')
 array_map = Primitive('array_map')
+array_map_into = Primitive('array_map_into')
 array_scan = Primitive('array_scan')
 array_reduce = Primitive('array_reduce')
 distribute = Primitive('distribute')
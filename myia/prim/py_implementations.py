@@ -1,12 +1,15 @@
 """Implementations for the debug VM."""
 
+from collections import Counter
 from copy import copy
+from numbers import Number
 from typing import Callable
+from weakref import WeakKeyDictionary
 import numpy as np
 import math
 
 from .. import dtype as types
-from ..utils import Registry, overload
+from ..utils import Registry, overload, UNKNOWN
 
 from . import ops as primops
 
@@ -343,45 +346,216 @@ def shape(array):
     return array.shape
 
 
+# Primitives that are implemented elementwise by a NumPy ufunc, which
+# array_map can use instead of calling the scalar implementation on every
+# element.
+ufunc_map = {
+    primops.scalar_add: np.add,
+    primops.scalar_sub: np.subtract,
+    primops.scalar_mul: np.multiply,
+    primops.scalar_div: np.true_divide,
+    primops.scalar_mod: np.mod,
+    primops.scalar_uadd: np.positive,
+    primops.scalar_usub: np.negative,
+    primops.scalar_exp: np.exp,
+    primops.scalar_log: np.log,
+    primops.scalar_sin: np.sin,
+    primops.scalar_cos: np.cos,
+    primops.scalar_tan: np.tan,
+    primops.scalar_eq: np.equal,
+    primops.scalar_lt: np.less,
+    primops.scalar_gt: np.greater,
+    primops.scalar_ne: np.not_equal,
+    primops.scalar_le: np.less_equal,
+    primops.scalar_ge: np.greater_equal,
+    primops.bool_not: np.logical_not,
+    primops.bool_and: np.logical_and,
+    primops.bool_or: np.logical_or,
+}
+
+
+_py_ufuncs = {py_implementations[prim]: ufunc
+              for prim, ufunc in ufunc_map.items()}
+
+
+_graph_kernels = WeakKeyDictionary()
+
+
+def _graph_kernel(g):
+    """Return a function that applies g elementwise using ufuncs.
+
+    This is possible if every node of g applies a primitive that is in
+    `ufunc_map`, or a graph for which this is also possible, on
+    parameters of g, scalar constants or other such nodes. Otherwise,
+    None is returned.
+    """
+    if g in _graph_kernels:
+        return _graph_kernels[g]
+    _graph_kernels[g] = None
+    from ..graph_utils import toposort
+    from ..ir import succ_incoming
+
+    steps = []
+    for node in toposort(g.output, succ_incoming):
+        if node.graph is not None and node.graph is not g:
+            return None
+        if node.is_apply():
+            fn, *args = node.inputs
+            if fn.is_constant_graph():
+                op = _graph_kernel(fn.value)
+            else:
+                op = ufunc_map.get(fn.value) if fn.is_constant() else None
+            if op is None:
+                return None
+            if any(arg.is_constant() and not isinstance(arg.value, Number)
+                   for arg in args):
+                return None
+            steps.append((node, op, args))
+        elif node is g.output:
+            # The kernel must return a new array, so that array_map_into
+            # can write in it.
+            return None
+
+    # The result of a node can be written in an intermediate array that
+    # is only used by that node, if they have the same type, instead of
+    # allocating a new one.
+    uses = Counter(arg for _, _, args in steps for arg in args)
+    inner = {node for node, _, _ in steps}
+    steps = [(node, op, args,
+              next((arg for arg in args
+                    if arg in inner and uses[arg] == 1
+                    and arg.type is not UNKNOWN and arg.type == node.type),
+                   None))
+             for node, op, args in steps]
+
+    def kernel(*arrays, out=None):
+        values = dict(zip(g.parameters, arrays))
+        for node, op, args, dead in steps:
+            args = [values[arg] if arg in values else arg.value
+                    for arg in args]
+            buf = out if node is g.output else None
+            if buf is None and dead is not None:
+                buf = values[dead]
+                if not isinstance(buf, np.ndarray) \
+                        or np.broadcast(*args).shape != buf.shape:
+                    buf = None
+            if buf is not None:
+                values[node] = op(*args, out=buf)
+            else:
+                values[node] = op(*args)
+        return values[g.output]
+
+    _graph_kernels[g] = kernel
+    return kernel
+
+
 @py_register(primops.array_map)
 def array_map(fn, *arrays):
     """Implement `array_map`."""
+    ufunc = _py_ufuncs.get(fn)
+    if ufunc is not None:
+        return ufunc(*arrays)
     return np.vectorize(fn)(*arrays)
 
 
 @vm_register(primops.array_map)
 def _array_map_vm(vm, fn, *arrays):
+    from ..ir import Graph
+    if isinstance(fn, primops.Primitive) and fn in ufunc_map:
+        return ufunc_map[fn](*arrays)
+    elif isinstance(fn, Graph):
+        kernel = _graph_kernel(fn)
+        if kernel is not None:
+            return kernel(*arrays)
+
     def fn_(*args):
         return vm.call(fn, args)
-    return array_map(fn_, *arrays)
+    return np.vectorize(fn_)(*arrays)
 
 
-@py_register(primops.array_scan)
-def array_scan(fn, init, array, axis):
-    """Implement `array_scan`."""
-    # This is inclusive scan because it's easier to implement
-    # We will have to discuss what semantics we want later
-    def f(ary):
-        val = init
-        it = np.nditer([ary, None])
-        for x, y in it:
-            val = fn(val, x)
-            y[...] = val
-        return it.operands[1]
-    return np.apply_along_axis(f, axis, array)
+def _writable_into(out, arrays):
+    # Whether the result of an elementwise operation on arrays can be
+    # written in out.
+    return isinstance(out, np.ndarray) and out.flags.writeable \
+        and all(np.shape(a) == out.shape for a in arrays)
 
 
-@vm_register(primops.array_scan)
-def _array_scan_vm(vm, fn, init, array, axis):
-    def fn_(a, b):
-        return vm.call(fn, [a, b])
-    return array_scan(fn_, init, array, axis)
+@py_register(primops.array_map_into)
+def array_map_into(out, fn, *arrays):
+    """Implement `array_map_into`."""
+    ufunc = _py_ufuncs.get(fn)
+    if ufunc is not None and _writable_into(out, arrays):
+        return ufunc(*arrays, out=out)
+    return array_map(fn, *arrays)
 
 
-@py_register(primops.array_reduce)
-def array_reduce(fn, array, shp):
-    """Implement `array_reduce`."""
-    ufn = np.frompyfunc(fn, 2, 1)
+@vm_register(primops.array_map_into)
+def _array_map_into_vm(vm, out, fn, *arrays):
+    from ..ir import Graph
+    if _writable_into(out, arrays):
+        if isinstance(fn, primops.Primitive) and fn in ufunc_map:
+            return ufunc_map[fn](*arrays, out=out)
+        elif isinstance(fn, Graph):
+            kernel = _graph_kernel(fn)
+            if kernel is not None:
+                return kernel(*arrays, out=out)
+    return _array_map_vm(vm, fn, *arrays)
+
+
+# Primitives that are implemented by a NumPy ufunc with reduce and
+# accumulate methods, which array_reduce and array_scan can use instead of
+# calling a Python function on every element.
+reducer_map = {
+    primops.scalar_add: np.add,
+    primops.scalar_mul: np.multiply,
+    primops.bool_and: np.logical_and,
+    primops.bool_or: np.logical_or,
+}
+
+
+_py_reducers = {py_implementations[prim]: ufunc
+                for prim, ufunc in reducer_map.items()}
+
+
+def _graph_reducer(g):
+    """Return the ufunc that g is equivalent to as a reducer, or None.
+
+    This recognizes graphs that apply a primitive of `reducer_map` to both
+    their parameters, or that select the maximum or the minimum of their
+    parameters with a comparison and switch.
+    """
+    from ..ir import Graph
+    if len(g.parameters) != 2 or not g.output.is_apply():
+        return None
+    params = set(g.parameters)
+    fn, *args = g.output.inputs
+    if not fn.is_constant():
+        return None
+    elif fn.value is primops.switch:
+        cond, a, b = args
+        if not cond.is_apply() or {a, b} != params \
+                or set(cond.inputs[1:]) != params:
+            return None
+        cmp = cond.inputs[0]
+        if cmp.is_constant() and cmp.value in (primops.scalar_gt,
+                                               primops.scalar_ge):
+            larger = True
+        elif cmp.is_constant() and cmp.value in (primops.scalar_lt,
+                                                 primops.scalar_le):
+            larger = False
+        else:
+            return None
+        # switch(x > y, x, y) is max(x, y)
+        return np.maximum if larger == (a is cond.inputs[1]) else np.minimum
+    elif set(args) != params:
+        return None
+    elif isinstance(fn.value, Graph):
+        return _graph_reducer(fn.value)
+    else:
+        return reducer_map.get(fn.value, None)
+
+
+def _array_reduce(fn, ufunc, array, shp):
     delta = len(array.shape) - len(shp)
     if delta < 0:
         raise ValueError('Shape to reduce to cannot be larger than original')
@@ -400,6 +574,17 @@ def array_reduce(fn, array, shp):
 
     reduction = [(i, False) for i in range(delta)] + reduction
 
+    axes = tuple(idx for idx, _ in reduction if idx is not None)
+    if not axes:
+        # The result must never share memory with the input, which could
+        # be overwritten afterwards (see opt.inplace.only_reads)
+        return np.array(array).reshape(shp)
+
+    if ufunc is not None:
+        array = ufunc.reduce(array, axis=axes, keepdims=True)
+        return np.reshape(array, shp)
+
+    ufn = np.frompyfunc(fn, 2, 1)
     for idx, keep in reversed(reduction):
         if idx is not None:
             array = ufn.reduce(array, axis=idx, keepdims=keep)
@@ -411,11 +596,59 @@ def array_reduce(fn, array, shp):
     return array
 
 
+@py_register(primops.array_reduce)
+def array_reduce(fn, array, shp):
+    """Implement `array_reduce`."""
+    return _array_reduce(fn, _py_reducers.get(fn, None), array, shp)
+
+
+def _vm_reducer(fn):
+    from ..ir import Graph
+    if isinstance(fn, primops.Primitive):
+        return reducer_map.get(fn, None)
+    elif isinstance(fn, Graph):
+        return _graph_reducer(fn)
+    else:
+        return None
+
+
 @vm_register(primops.array_reduce)
 def _array_reduce_vm(vm, fn, array, shp):
     def fn_(a, b):
         return vm.call(fn, [a, b])
-    return array_reduce(fn_, array, shp)
+    return _array_reduce(fn_, _vm_reducer(fn), array, shp)
+
+
+def _array_scan(fn, ufunc, init, array, axis):
+    if ufunc is not None:
+        # The scan is inclusive and ufunc is associative, so the init value
+        # can be combined with the accumulated values at the end.
+        res = ufunc(init, ufunc.accumulate(array, axis=axis))
+        return res.astype(array.dtype, copy=False)
+
+    # This is inclusive scan because it's easier to implement
+    # We will have to discuss what semantics we want later
+    def f(ary):
+        val = init
+        it = np.nditer([ary, None])
+        for x, y in it:
+            val = fn(val, x)
+            y[...] = val
+        return it.operands[1]
+    return np.apply_along_axis(f, axis, array)
+
+
+@py_register(primops.array_scan)
+def array_scan(fn, init, array, axis):
+    """Implement `array_scan`."""
+    return _array_scan(fn, _py_reducers.get(fn, None), init, array, axis)
+
+
+@vm_register(primops.array_scan)
+def _array_scan_vm(vm, fn, init, array, axis):
+    def fn_(a, b):
+        return vm.call(fn, [a, b])
+    return _array_scan(fn_, _vm_reducer(fn), init, array, axis)
 
 
 @register(primops.distribute)
@@ -306,6 +306,12 @@ async def infer_shape_array_map(track, fn, *arrays):
     return tuple(rshape)
 
 
+@shape_inferrer(P.array_map_into, nargs=None)
+async def infer_shape_array_map_into(track, out, fn, *arrays):
+    """Infer the shape of array_map_into."""
+    return await infer_shape_array_map(track, fn, out, *arrays)
+
+
 @shape_inferrer(P.list_map, nargs=None)
 async def infer_shape_list_map(track, fn, *lsts):
     """Infer the shape of list_map."""
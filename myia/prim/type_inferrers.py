@@ -320,6 +320,18 @@ async def infer_type_array_map(track, fn, *arrays):
     return Array[await fn_t(*vrefs)]
 
 
+@type_inferrer(P.array_map_into, nargs=None)
+async def infer_type_array_map_into(track, out, fn, *arrays):
+    """Infer the return type of array_map_into."""
+    res_t = await infer_type_array_map(track, fn, *arrays)
+    out_t = await out['type']
+    if out_t != res_t:
+        raise MyiaTypeError(
+            f"Cannot write a result of type {res_t} into {out_t}"
+        )
+    return res_t
+
+
 @type_inferrer(P.array_reduce, nargs=3)
 async def infer_type_reduce(track, fn, ary, shp):
     """Infer the return type of array_reduce."""
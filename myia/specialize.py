@@ -1,13 +1,17 @@
 """Specialize graphs according to the types of their arguments."""
 
-from collections import Counter
+from collections import Counter, defaultdict
+from copy import copy
 
 from .dtype import Type, Function, Number, Bool, Problem, TypeType, TypeMeta
 from .infer import ANYTHING, Context, reify, \
-    GraphInferrer, MetaGraphInferrer, PartialInferrer, Inferrer
-from .ir import GraphCloner, Constant
+    GraphInferrer, MetaGraphInferrer, PartialInferrer, Inferrer, \
+    ValueWrapper, Reference
+from .graph_utils import dfs
+from .ir import GraphCloner, Constant, graph_hash, succ_deeper
 from .prim import ops as P, Primitive
-from .utils import Named, Overload
+from .prim.shape_inferrers import TupleShape, ListShape, ClassShape
+from .utils import Named, Overload, overload
 
 
 UNKNOWN = Named('UNKNOWN')
@@ -17,6 +21,27 @@ INACCESSIBLE = Named('INACCESSIBLE')
 AMBIGUOUS = Named('AMBIGUOUS')
 
 
+class SpecializationBudgetError(Exception):
+    """Raised when the specialization budget of a graph is exceeded.
+
+    Attributes:
+        graph: The original graph that could not be specialized.
+        count: The number of specializations already made for that graph.
+        nodes: The total number of nodes in all specializations.
+
+    """
+
+    def __init__(self, graph, count, nodes):
+        """Initialize a SpecializationBudgetError."""
+        super().__init__(
+            f'Specialization budget exceeded for {graph}'
+            f' ({count} specializations, {nodes} nodes in total)'
+        )
+        self.graph = graph
+        self.count = count
+        self.nodes = nodes
+
+
 class _Unspecializable(Exception):
     def __init__(self, problem):
         problem = Problem[problem]
@@ -30,17 +55,136 @@ def _const(v, t):
     return ct
 
 
-class TypeSpecializer:
-    """Specialize a graph using inferred type information."""
+async def _reify_context(ctx):
+    # Contexts may contain different InferenceVars that resolve to the same
+    # values. Build a context that only contains the resolved values, so that
+    # equivalent contexts compare equal.
+    if ctx.parent is None:
+        return ctx
+    parent = await _reify_context(ctx.parent)
+    argvals = []
+    for argkey in ctx.argkey:
+        argval = {}
+        for track, v in argkey:
+            if not isinstance(v, ValueWrapper):
+                v = await reify(v)
+            argval[track] = v
+        argvals.append(argval)
+    return Context(parent, ctx.graph, argvals)
+
+
+@overload
+def _covers(c: (tuple, list), r):
+    return type(c) is type(r) and len(c) == len(r) \
+        and all(_covers(x, y) for x, y in zip(c, r))
+
+
+@overload  # noqa: F811
+def _covers(c: (TupleShape, ListShape), r):
+    return type(c) is type(r) and _covers(c.shape, r.shape)
+
+
+@overload  # noqa: F811
+def _covers(c: ClassShape, r):
+    return type(c) is type(r) and c.shape.keys() == r.shape.keys() \
+        and all(_covers(c.shape[k], r.shape[k]) for k in c.shape)
+
+
+@overload  # noqa: F811
+def _covers(c: object, r):
+    return c is ANYTHING or c == r
+
+
+def _signature(ctx):
+    # The graphs and argument types of the context and its parents.
+    rval = []
+    while ctx.parent is not None:
+        rval.append((ctx.graph, tuple(dict(argkey)['type']
+                                      for argkey in ctx.argkey)))
+        ctx = ctx.parent
+    return tuple(rval)
+
+
+def _context_covers(c, r):
+    # Whether the specialization for context c is valid in context r. This
+    # is the case if both contexts have the same types, and everything that
+    # is known in c about values, shapes, etc. is also true in r.
+    while c.parent is not None:
+        if r.parent is None or c.graph is not r.graph \
+                or len(c.argkey) != len(r.argkey):
+            return False
+        for ca, ra in zip(c.argkey, r.argkey):
+            for (track, cv), (_, rv) in zip(ca, ra):
+                if track == 'type':
+                    if cv != rv:
+                        return False
+                elif not _covers(cv, rv):
+                    return False
+        c, r = c.parent, r.parent
+    return r.parent is None
+
 
-    def __init__(self, engine):
+class TypeSpecializer:
+    """Specialize a graph using inferred type information.
+
+    Arguments:
+        engine: The InferenceEngine that holds the inference results.
+        max_specializations: The maximal number of specializations for
+            each graph with the same argument types, or None for no limit.
+            Specializations for different types cannot be merged, so they
+            are not limited by this number.
+        max_nodes: The maximal number of nodes in all specialized graphs,
+            or None for no limit.
+
+    When the budget is exhausted for a graph, the context is broadened: an
+    existing specialization made for the same types, but with less
+    information about values or shapes, is reused, or one is made from the
+    broadest context that was inferred for the same graph with the same
+    types. A new specialization is also allowed if it is broader than an
+    existing one, so that it can be reused later.
+    Graphs that are nested in other graphs are only limited by max_nodes.
+
+    If there is no broader context, SpecializationBudgetError is raised.
+    This is intended: the specialized graphs must be fully typed, so there
+    is no generic version of a graph to fall back on, and only a broader
+    context that was inferred can provide one.
+
+    Attributes:
+        originals: Map each specialized graph to the original graph.
+        specializations: Map each context to the specialized graph for
+            that context.
+        counts: Map each original graph to the number of specializations
+            that were made for it.
+        collapsed: Map each original graph to the number of contexts that
+            reused an existing specialization because they were equivalent
+            to a previous context once reified.
+        broadened: Map each original graph to the number of contexts that
+            reused a generic specialization because the budget was
+            exhausted.
+        merged: Map each original graph to the number of its
+            specializations that were replaced by an identical one, once
+            they were all made.
+        total_nodes: The number of nodes in all specialized graphs.
+
+    """
+
+    def __init__(self, engine, max_specializations=None, max_nodes=None):
         """Initialize a TypeSpecializer."""
         self.engine = engine
         self.mng = self.engine.mng
         self.node_map = self.mng.nodes
+        self.max_specializations = max_specializations
+        self.max_nodes = max_nodes
         self.originals = {}
         self.specializations = {}
         self.counts = Counter()
+        self.collapsed = Counter()
+        self.broadened = Counter()
+        self.merged = Counter()
+        self.total_nodes = 0
+        self._contexts = defaultdict(list)
+        self._broader = set()
+        self._inferred = None
 
     def run(self, graph, context):
         """Run the specializer on the given graph in the given context."""
@@ -51,26 +195,153 @@ class TypeSpecializer:
         argrefs = [self.engine.ref(p, context)
                    for p in graph.parameters]
 
-        return self.engine.run_coroutine(
+        result = self.engine.run_coroutine(
             self._specialize(None, ginf, argrefs)
         )
+        self._merge_duplicates(result)
+        return result
 
     async def _specialize(self, parent, ginf, argrefs):
         g = await ginf.make_graph(argrefs)
         ctx = await ginf.make_context(argrefs)
 
-        ctxkey = ctx  # TODO: Reify ctx to collapse multiple ctx into one
+        if ctx in self.specializations:
+            return self.specializations[ctx]
+
+        ctxkey = await _reify_context(ctx)
         if ctxkey in self.specializations:
-            return self.specializations[ctxkey]
+            self.collapsed[g] += 1
+            g2 = self.specializations[ctxkey]
+            self.specializations[ctx] = g2
+            return g2
+
+        if self._over_budget(g, ctxkey):
+            g2 = await self._broaden(parent, ginf, g, ctxkey)
+            self.broadened[g] += 1
+            self.specializations[ctx] = g2
+            return g2
 
         self.counts[g] += 1
+        self.total_nodes += len(self.node_map[g])
         gspec = _GraphSpecializer(parent, self, g, ctx)
         g2 = gspec.new_graph
         self.originals[g2] = g
+        self.specializations[ctx] = g2
         self.specializations[ctxkey] = g2
+        if g.parent is None:
+            self._contexts[_signature(ctxkey)].append((ctxkey, g2))
         await gspec.run()
         return g2
 
+    def _merge_duplicates(self, root):
+        # Different contexts, e.g. with different values for a parameter
+        # that is not used, can lead to identical specializations. Each one
+        # is replaced by the first identical one. Only graphs that are not
+        # nested can be merged, and since they refer to each other by
+        # identity in the hash, this is repeated until there are no changes.
+        top = [g2 for g2, g in self.originals.items() if g.parent is None]
+        nodes = [node for node in dfs(root.return_, succ_deeper)
+                 if node.is_apply()]
+        while True:
+            keep = set(top)
+            seen = {}
+            repl = {}
+            for g2 in top:
+                key = graph_hash(g2, properties=('type', 'shape'),
+                                 opaque=keep.__contains__)
+                if key in seen:
+                    repl[g2] = seen[key]
+                else:
+                    seen[key] = g2
+            if not repl:
+                return
+            for node in nodes:
+                for i, inp in enumerate(node.inputs):
+                    if inp.is_constant_graph() and inp.value in repl:
+                        ct = Constant(repl[inp.value])
+                        ct.inferred = copy(inp.inferred)
+                        node.inputs[i] = ct
+            for g2 in repl:
+                self.merged[self.originals[g2]] += 1
+            for ctx, g2 in self.specializations.items():
+                self.specializations[ctx] = repl.get(g2, g2)
+            top = [g2 for g2 in top if g2 not in repl]
+
+    def _over_budget(self, g, ctxkey):
+        # A broader context chosen by _broaden must be specialized, since
+        # there is nothing else to fall back on.
+        if ctxkey in self._broader:
+            return False
+        # A context that is broader than an existing one gets its own
+        # specialization, so that more specific contexts can reuse it.
+        existing = self._contexts[_signature(ctxkey)]
+        if any(_context_covers(ctxkey, c) for c, _ in existing):
+            return False
+        if self.max_nodes is not None \
+                and self.total_nodes + len(self.node_map[g]) > self.max_nodes:
+            return True
+        return self.max_specializations is not None and g.parent is None \
+            and len(existing) >= self.max_specializations
+
+    async def _inferred_contexts(self, g):
+        # The contexts in which g was inferred, with their reified
+        # versions. The inference cache is only indexed once, the first
+        # time this is needed.
+        if self._inferred is None:
+            self._inferred = defaultdict(dict)
+            for key in self.engine.cache.cache:
+                if isinstance(key, tuple) and len(key) == 2 \
+                        and isinstance(key[1], Reference):
+                    ctx = key[1].context
+                    self._inferred[ctx.graph][ctx] = None
+        contexts = self._inferred[g]
+        for ctx, c in contexts.items():
+            if c is None:
+                contexts[ctx] = await _reify_context(ctx)
+        return contexts.items()
+
+    async def _broaden(self, parent, ginf, g, ctxkey):
+        sig = _signature(ctxkey)
+        for c, g2 in self._contexts[sig]:
+            if _context_covers(c, ctxkey):
+                return g2
+        # Nothing suitable was specialized yet, but broader contexts may
+        # have been inferred for the same graph, in which case we specialize
+        # the broadest one, so that it can be reused as much as possible.
+        best = None
+        for ctx, c in await self._inferred_contexts(g):
+            if c != ctxkey and _signature(c) == sig \
+                    and _context_covers(c, ctxkey) \
+                    and (best is None or _context_covers(c, best[1])):
+                best = ctx, c
+        if best is not None:
+            ctx, c = best
+            self._broader.add(c)
+            argrefs = [self.engine.ref(p, ctx) for p in g.parameters]
+            return await self._specialize(parent, ginf, argrefs)
+        raise SpecializationBudgetError(g, self.counts[g], self.total_nodes)
+
+    def report(self, n=10):
+        """Return a report about the most specialized graphs.
+
+        Arguments:
+            n: The number of graphs to list.
+
+        Returns:
+            A string with one line for each of the n graphs that have the
+            most specializations.
+
+        """
+        lines = [f'{self.total_nodes} nodes in'
+                 f' {sum(self.counts.values())} specializations']
+        for g, count in self.counts.most_common(n):
+            lines.append(f'{count:>6} {g}'
+                         f' ({len(self.node_map[g])} nodes,'
+                         f' {self.collapsed[g]} collapsed,'
+                         f' {self.broadened[g]} broadened,'
+                         f' {self.merged[g]} merged)')
+        return '\n'.join(lines)
+
 
 async def _find_argrefs(inf):
     # The cache works using References, but if two references have
@@ -99,6 +99,7 @@ whitelist = frozenset({
     P.broadcast_shape,
     P.shape,
     P.array_map,
+    P.array_map_into,
     P.array_scan,
     P.array_reduce,
     P.distribute,
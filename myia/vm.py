@@ -82,13 +82,21 @@ class Partial:
 
 
 class VM:
-    """Virtual Machine interface."""
+    """Virtual Machine interface.
+
+    Attributes:
+        profiler: A GraphProfiler to notify of the graphs that are
+            entered and left and of the primitives that are applied, or
+            None.
+
+    """
 
     class _Call(Exception):
         """Indicate a call to a new frame."""
 
-        def __init__(self, frame):
+        def __init__(self, frame, graph):
             self.frame = frame
+            self.graph = graph
 
     class _Return(Exception):
         """Indicates a return with its value."""
@@ -110,6 +118,7 @@ class VM:
         })
         self.implementations = implementations
         self.py_implementations = py_implementations
+        self.profiler = None
         self._vars = defaultdict(set)
 
     def _compute_fvs(self, graph):
@@ -170,26 +179,41 @@ class VM:
                             closure=closure)
         frames = [top_frame]
 
-        while frames:
-            try:
-                frame = frames[-1]
-                todo = frame.todo
-                while todo:
-                    self._handle_node(todo[-1], frame)
-                    todo.pop()
-            except self._Call as c:
-                # The last element of todo is always a return
-                if len(todo) == 2:
-                    frames[-1] = c.frame
-                else:
-                    frames.append(c.frame)
-            except self._Return as r:
-                frames.pop()
-                if frames:
-                    frames[-1].values[frames[-1].todo[-1]] = r.value
-                    frames[-1].todo.pop()
-                else:
-                    return self.export(r.value)
+        profiler = self.profiler
+        if profiler is not None:
+            depth = profiler.depth
+            profiler.enter(graph)
+
+        try:
+            while frames:
+                try:
+                    frame = frames[-1]
+                    todo = frame.todo
+                    while todo:
+                        self._handle_node(todo[-1], frame)
+                        todo.pop()
+                except self._Call as c:
+                    # The last element of todo is always a return
+                    if len(todo) == 2:
+                        frames[-1] = c.frame
+                        if profiler is not None:
+                            profiler.leave()
+                    else:
+                        frames.append(c.frame)
+                    if profiler is not None:
+                        profiler.enter(c.graph)
+                except self._Return as r:
+                    frames.pop()
+                    if profiler is not None:
+                        profiler.leave()
+                    if frames:
+                        frames[-1].values[frames[-1].todo[-1]] = r.value
+                        frames[-1].todo.pop()
+                    else:
+                        return self.export(r.value)
+        finally:
+            if profiler is not None:
+                profiler.unwind(depth)
 
     def _succ_vm(self, node: ANFNode) -> Iterable[ANFNode]:
         """Follow node.incoming and free variables."""
@@ -230,7 +254,8 @@ class VM:
 
         raise self._Call(VMFrame(toposort(graph.return_, self._succ_vm),
                                  dict(zip(graph.parameters, args)),
-                                 closure=clos))
+                                 closure=clos),
+                         graph)
 
     def _make_closure(self, graph: Graph, frame: VMFrame) -> Closure:
         clos = dict()
@@ -251,6 +276,8 @@ class VM:
                 res = Partial(partial_fn, partial_args, self)
                 frame.values[node] = res
             else:
+                if self.profiler is not None:
+                    self.profiler.primitive(fn)
                 frame.values[node] = self.implementations[fn](self, *args)
         elif isinstance(fn, Partial):
             self._dispatch_call(node, frame, fn.fn, fn.args + tuple(args))
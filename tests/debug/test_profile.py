@@ -0,0 +1,120 @@
+"""Test the profiling of the VMs."""
+
+import pstats
+from io import StringIO
+
+import pytest
+
+from myia.api import scalar_parse as parse, standard_pipeline, \
+    standard_debug_pipeline
+from myia.debug.profile import GraphProfiler
+from myia.dtype import Int
+from myia.prim import ops as P
+
+
+def helper(x, y):
+    return x * y + 1
+
+
+def loop(x, n):
+    i = 0
+    while i < n:
+        x = helper(x, i)
+        i = i + 1
+    return x
+
+
+def remainder(x, y):
+    return helper(x, y) % y
+
+
+argspec = ({'type': Int[64]}, {'type': Int[64]})
+
+
+def _names(prof):
+    prof.create_stats()
+    return {name: stats for (_, _, name), stats in prof.stats.items()}
+
+
+@pytest.mark.parametrize('pipeline', [standard_pipeline,
+                                      standard_debug_pipeline])
+def test_profile(pipeline):
+    res = pipeline.configure({'export.profile': True}).make()(
+        input=loop, argspec=argspec
+    )
+    assert res['output'](2, 5) == loop(2, 5)
+    prof = res['profiler']
+    names = _names(prof)
+
+    assert names['loop'][:2] == (1, 1)
+    assert names['helper'][:2] == (5, 5)
+    assert names['⤾loop'][:2] == (6, 6)
+    assert names['<primitive scalar_mul>'][:2] == (5, 5)
+    assert names['<primitive scalar_lt>'][:2] == (6, 6)
+    helper_key, = (k for k in prof.stats if k[2] == 'helper')
+    assert helper_key[1] == helper.__code__.co_firstlineno
+    callers = names['helper'][4]
+    assert [k[2] for k in callers] == ['⥁loop']
+
+    cc, nc, tt, ct, _ = names['loop']
+    assert 0 <= tt <= ct
+
+    stream = StringIO()
+    pstats.Stats(prof, stream=stream).sort_stats('tottime').print_stats()
+    assert 'helper' in stream.getvalue()
+    report = prof.report()
+    assert '<primitive scalar_mul>' in report
+    assert '⥁loop' in report
+
+
+@pytest.mark.parametrize('pipeline', [standard_pipeline,
+                                      standard_debug_pipeline])
+def test_profile_error(pipeline):
+    res = pipeline.configure({'export.profile': True}).make()(
+        input=remainder, argspec=argspec
+    )
+    fn = res['output']
+    prof = res['profiler']
+    with pytest.raises(ZeroDivisionError):
+        fn(3, 0)
+    assert prof.depth == 0
+    assert fn(3, 2) == remainder(3, 2)
+    assert _names(prof)['remainder'][:2] == (2, 2)
+
+
+def test_profiler_times():
+    @parse
+    def f(x):
+        return x
+
+    @parse
+    def g(x):
+        return x
+
+    t = 0
+
+    def timer():
+        return t
+
+    prof = GraphProfiler(timer=timer)
+    prof.enter(f)
+    t = 1
+    prof.enter(g)
+    t = 3
+    prof.enter(g)
+    t = 6
+    prof.leave()
+    prof.primitive(P.scalar_add, 2)
+    prof.leave()
+    t = 10
+    prof.leave()
+    assert prof.depth == 0
+
+    stats = _names(prof)
+    # g ran for 5 units, 3 of which in its recursive call
+    assert stats['g'] == (1, 2, 5, 5, {prof.key(f): (1, 1, 2, 5),
+                                       prof.key(g): (0, 1, 3, 0)})
+    assert stats['f'] == (1, 1, 5, 10, {})
+    assert stats['<primitive scalar_add>'] == (2, 2, 0, 0,
+                                               {prof.key(g): (2, 2, 0, 0)})
+    assert prof.report().startswith('3 graph calls and 2 primitive calls')
@@ -1,7 +1,9 @@
 
 import pytest
+from copy import copy
 
 from myia.dtype import Int, Float, Function
+from myia.info import About
 from myia.ir.anf import PARAMETER, Apply, Constant, Graph, Parameter
 from myia.prim import ops as primops
 from myia.utils import UNKNOWN
@@ -88,9 +90,40 @@ def test_str_coverage():
     """
     g = Graph()
     p = Parameter(g)
-    p.name = 'param'
+    p.debug.name = 'param'
     objects = [g, Apply([], g), p, Parameter(g), Constant(0), Constant(g)]
     for o in objects:
         str(o)
         repr(o)
         o.debug.debug_name
+
+
+def test_slots():
+    g = Graph()
+    for node in [Apply([], g), Parameter(g), Constant(0)]:
+        assert not hasattr(node, '__dict__')
+
+
+def test_lazy_debug():
+    g = Graph()
+    with About(g.debug, 'copy'):
+        p = Parameter(g)
+    assert p.debug.about.debug is g.debug
+    assert p.debug.about.relation == 'copy'
+    assert p.debug.obj is p
+    assert Parameter(g).debug.about is None
+
+
+def test_inferred():
+    c = Constant(0)
+    assert c.type is UNKNOWN
+    assert 'type' not in c.inferred
+    assert c.inferred.get('value', 1) == 1
+    c.type = Int[64]
+    c.inferred['value'] = 0
+    assert c.inferred['type'] is Int[64]
+    assert dict(c.inferred.items()) == {'type': Int[64], 'value': 0}
+    inf = copy(c.inferred)
+    inf['value'] = 1
+    assert c.inferred['value'] == 0
+    assert inf['type'] is Int[64]
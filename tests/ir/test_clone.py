@@ -1,4 +1,7 @@
 
+import gc
+import weakref
+
 import pytest
 
 from myia.api import scalar_parse as parse
@@ -231,3 +234,57 @@ def test_clone_without_forcing_manager():
     clone(f)
     clone(f)
     GraphManager(f)
+
+
+def test_clone_managed():
+    @clone
+    @parse
+    def f(x, y):
+        def g(z):
+            return z * x
+        return g(y) + x
+
+    # Unmanaged graphs are cloned without giving them a manager.
+    cl = GraphCloner(f, total=True)
+    f2 = cl[f]
+    assert f._manager is None
+    assert f2._manager is None
+
+    # A manager that all the graphs share is reused.
+    mng = GraphManager(f)
+    ngraphs = len(mng.graphs)
+    cl = GraphCloner(f, total=True)
+    f3 = cl[f]
+    assert cl.manager is mng
+    assert len(mng.graphs) == ngraphs
+    assert f3._manager is None
+
+    mng2 = GraphManager(f2)
+    mng3 = GraphManager(f3)
+    assert len(mng2.graphs) == len(mng3.graphs) == ngraphs
+    assert len(mng2.all_nodes) == len(mng3.all_nodes) == len(mng.all_nodes)
+
+
+def test_clone_does_not_keep_original():
+    @clone
+    @parse
+    def f(x, y):
+        def g(z):
+            return z * x
+        return g(y) + x
+
+    out = f.output
+    f2 = clone(f)
+    assert f2.output.debug.about.debug.obj is out
+
+    f3 = clone(f)
+    wf = weakref.ref(f)
+    wout = weakref.ref(out)
+    del f, out
+    gc.collect()
+    assert wf() is None
+    assert wout() is None
+    # The debug information of the clone can still be created
+    about = f3.output.debug.about
+    assert about.relation == 'copy'
+    assert about.debug.obj is None
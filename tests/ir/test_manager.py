@@ -5,7 +5,8 @@ from collections import Counter
 
 from myia.api import scalar_parse as parse
 from myia.debug.label import short_labeler
-from myia.ir import manage, GraphManager, GraphCloner, ManagerError
+from myia.ir import manage, Constant, GraphManager, GraphCloner, \
+    ManagerError
 from myia.prim import Primitive
 
 
@@ -812,3 +813,185 @@ def test_graph_properties():
         assert g.children is mng.children[g]
         assert g.scope is mng.scopes[g]
         assert g.recursive is mng.recursive[g]
+
+
+def test_batched_commit():
+
+    @clone
+    @parse
+    def f(x, y):
+        def g(z):
+            return z * x
+        a = x * y
+        return g(a) + g(a + y)
+
+    mng = manage(f)
+    g, = [g2 for g2 in mng.graphs if g2 is not f]
+    x, y = f.parameters
+    assert g.parent is f
+
+    calls = Counter()
+
+    @mng.events.mod_edges.register
+    def on_mod_edges(event, edges):
+        calls['mod_edges'] += 1
+
+    @mng.events.invalidate_nesting.register
+    def on_invalidate_nesting(event):
+        calls['invalidate_nesting'] += 1
+
+    # The dependency of g on f is removed and added back in the same
+    # commit, so the nesting stays valid.
+    mng.replace(x, y)
+    assert calls == {'mod_edges': 1}
+    assert g.free_variables_direct == {y: 1}
+
+    with mng.transact() as tr:
+        for node, key in mng.uses[y]:
+            if node.graph is g:
+                tr.set_edge(node, key, Constant(2))
+    assert calls == {'mod_edges': 2, 'invalidate_nesting': 1}
+    assert g.parent is None
+
+    fresh = GraphManager(f, manage=False)
+    for name in ['nodes', 'constants', 'free_variables_direct',
+                 'graph_constants', 'graphs_used', 'graph_users',
+                 'graph_dependencies_direct', 'graph_dependencies_prox',
+                 'free_variables_total', 'parents', 'scopes']:
+        assert getattr(mng, name) == getattr(fresh, name), name
+
+
+def test_lazy_statistics():
+
+    @clone
+    @parse
+    def f(x, y):
+        def g(z):
+            return z * x
+        return g(x * y) + g(y)
+
+    mng = GraphManager(f)
+    assert 'constants' not in vars(mng)
+    assert 'graph_users' not in vars(mng)
+    assert f in mng.nodes
+    assert 'constants' not in vars(mng)
+
+    x, y = f.parameters
+
+    created = []
+
+    def on_add_node(event, node):
+        # Statistics created while edges are being processed
+        if not created:
+            created.append(mng.graph_users)
+            created.append(mng.free_variables_total)
+
+    mng.events.add_node.register(on_add_node)
+    call_g = f.output.inputs[2]
+    with mng.transact() as tr:
+        tr.replace(x, y)
+        tr.replace(f.output.inputs[1], f.apply(call_g.inputs[0], 3))
+    mng.events.add_node.remove(on_add_node)
+    assert created
+    mng.constants
+
+    fresh = GraphManager(f, manage=False)
+    for name in ['nodes', 'constants', 'free_variables_direct',
+                 'graph_constants', 'graphs_used', 'graph_users',
+                 'graph_dependencies_direct', 'graph_dependencies_prox',
+                 'free_variables_total', 'parents', 'scopes']:
+        assert getattr(mng, name) == getattr(fresh, name), name
+
+    mng.reset()
+    assert 'constants' not in vars(mng)
+    assert mng.constants == fresh.constants
+
+
+def _check_nesting(mng):
+    fresh = GraphManager(manage=False)
+    for g in mng.graphs:
+        fresh.add_graph(g)
+    for name in ['graph_dependencies_total', 'parents', 'children', 'scopes',
+                 'free_variables_total', 'graphs_reachable', 'recursive']:
+        assert getattr(mng, name) == getattr(fresh, name), name
+
+
+def test_incremental_nesting():
+
+    @clone
+    @parse
+    def f(x):
+        def g(y):
+            return y * x
+        return g(x) + 1
+
+    @clone
+    @parse
+    def h(z):
+        return z + 1
+
+    mng = manage(f)
+    mng.replace(f.output.inputs[1], f.apply(h, f.output.inputs[1]))
+    assert not mng.recursive[f]
+    _check_nesting(mng)
+    stats = [mng._graph_dependencies_total, mng._parents, mng._children,
+             mng._scopes, mng._free_variables_total, mng._recursive]
+
+    # Inlining h in f, which drops h, keeps the statistics valid
+    call_h = f.output.inputs[1]
+    mng.replace(call_h, f.apply(h.output.inputs[0], call_h.inputs[1], 1))
+    assert h not in mng.graphs
+    assert all(stat.valid for stat in stats)
+    _check_nesting(mng)
+
+    # A graph that is added keeps them valid as well
+    mng.add_graph(h)
+    assert all(stat.valid for stat in stats)
+    _check_nesting(mng)
+
+    # h calls itself
+    mng.replace(h.output.inputs[2], h.apply(h, 1))
+    assert mng.recursive[h]
+    assert mng._recursive.valid
+    _check_nesting(mng)
+
+    # f and h call each other
+    mng.set_edge(f.output, 2, f.apply(h, 2))
+    mng.set_edge(h.output.inputs[2], 0, Constant(f))
+    assert mng.recursive[f] and mng.recursive[h]
+    _check_nesting(mng)
+
+    mng.set_edge(h.output.inputs[2], 0, Constant(h))
+    assert not mng.recursive[f] and mng.recursive[h]
+    _check_nesting(mng)
+
+    # g no longer needs a free variable
+    g, = mng.children[f]
+    mng.replace(g.output, g.parameters[0])
+    assert mng.parents[g] is None
+    _check_nesting(mng)
+
+
+def test_uses():
+
+    @clone
+    @parse
+    def f(x, y):
+        a = x * y
+        return a + a * y
+
+    mng = manage(f)
+    x, y = f.parameters
+    a = f.output.inputs[1]
+    assert mng.uses[x] == ((a, 1),)
+    assert set(mng.uses[y]) == {(a, 2), (f.output.inputs[2], 2)}
+    assert mng.uses[f.return_] == ()
+    assert mng.uses.get(f.return_) is None
+    assert f.return_ not in mng.uses
+
+    # Nodes that are dropped are forgotten
+    mng.replace(f.output, a)
+    assert set(mng.uses[y]) == {(a, 2)}
+    assert set(mng.uses) <= mng.all_nodes
+    assert all(mng.uses[node] for node in mng.uses)
+    _check_uses(mng)
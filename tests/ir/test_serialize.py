@@ -0,0 +1,215 @@
+
+import io
+from dataclasses import dataclass
+
+import numpy as np
+import pytest
+
+from myia.api import scalar_parse as parse, standard_debug_pipeline
+from myia.dtype import Array, Bool, Float, Function, Int, List, Problem, \
+    Tuple, External, pytype_to_myiatype
+from myia.infer import ANYTHING
+from myia.ir import Constant, Graph, SerializationError, clone, dump, \
+    dumps, graph_hash, isomorphic, load, loads, manage
+from myia.ir import serialize
+from myia.prim import ops as P, Primitive
+from myia.prim.shape_inferrers import NOSHAPE, TupleShape, ListShape
+from myia.specialize import DEAD
+from myia.utils import UNKNOWN
+
+
+@dataclass(frozen=True)
+class Pair:
+    left: Int[64]
+    right: Int[64]
+
+    def total(self):
+        return self.left + self.right
+
+
+def _roundtrip(x):
+    return loads(dumps(x))
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False, 0, 1, -1, 2**70, -2**70, 1.5, float('inf'),
+    'hello', '', 'héllo', b'\x00\x01',
+    (1, (2, 'a')), [1, [2.5, None]], {'a': 1, 2: (3,)},
+])
+def test_serialize_values(value):
+    res = _roundtrip(value)
+    assert res == value
+    assert type(res) is type(value)
+
+
+@pytest.mark.parametrize('value', [
+    Int[64], Float[32], Bool, Array[Float[64]], List[Int[8]],
+    Tuple[Int[64], Array[Int[16]]], Function[(Int[64], Bool), Tuple[()]],
+    Problem[DEAD], External[int], pytype_to_myiatype(Pair),
+    P.scalar_add, P.make_record, UNKNOWN, ANYTHING, NOSHAPE,
+    (Int[64], Int[64], 'x', 'x'),
+])
+def test_serialize_identity(value):
+    res = _roundtrip(value)
+    assert res is value or res == value and all(
+        a is b for a, b in zip(res, value)
+    )
+
+
+def test_serialize_records_and_arrays():
+    shape = TupleShape([(2, 3), ListShape(ANYTHING)])
+    assert _roundtrip(shape) == shape
+
+    arr = np.arange(12, dtype='float32').reshape((3, 4))
+    res = _roundtrip(arr)
+    assert res.dtype == arr.dtype
+    assert (res == arr).all()
+    res[0, 0] = 100
+
+    x = np.int16(-7)
+    assert _roundtrip(x) == x
+    assert type(_roundtrip(x)) is np.int16
+
+
+def test_serialize_graph():
+    @parse
+    def f(x, y):
+        def g(z):
+            return z * x
+        return g(y) + x if x > 0 else y
+
+    f.flags['core'] = True
+    buf = io.BytesIO()
+    dump(f, buf)
+    buf.seek(0)
+    f2 = load(buf)
+
+    assert isinstance(f2, Graph)
+    assert f2._manager is None
+    assert isomorphic(f, f2)
+    assert f2.flags == {'core': True}
+    assert len(manage(f2).graphs) == len(manage(f).graphs)
+
+    # Shared graphs are only saved once
+    a, b = _roundtrip((f, f))
+    assert a is b
+
+
+def test_serialize_inferred():
+    g = Graph()
+    p = g.add_parameter()
+    p.debug.name = 'p'
+    p.type = Array[Float[64]]
+    p.inferred['shape'] = (2, 3)
+    p.inferred['value'] = ANYTHING
+    g.output = p
+
+    g2 = _roundtrip(g)
+    p2, = g2.parameters
+    assert p2.type is Array[Float[64]]
+    assert p2.inferred['shape'] == (2, 3)
+    assert p2.inferred['value'] is ANYTHING
+    assert g2.output is p2
+    assert p2.debug.name == 'p'
+
+
+@pytest.mark.parametrize('split', ['parse', 'specialize', 'prepare'])
+def test_serialize_pipeline(split):
+    def f(x, y):
+        def g(a):
+            return a * x + y
+        return g(x) if x > 0 else -g(y)
+
+    steps = ['parse', 'resolve', 'infer', 'specialize', 'prepare', 'opt',
+             'validate', 'cconv', 'export']
+    i = steps.index(split) + 1
+    argspec = ({'type': Int[64]}, {'type': Int[64]})
+
+    res = standard_debug_pipeline.select(*steps[:i]).make()(
+        input=f, argspec=argspec
+    )
+    graph = _roundtrip(res['graph'])
+    res = standard_debug_pipeline.select(*steps[i:]).make()(
+        graph=graph, argspec=argspec
+    )
+    assert res['output'](3, 4) == f(3, 4)
+    assert res['output'](-3, 4) == f(-3, 4)
+
+
+def test_serialize_stable_ids():
+    prims = [v for v in vars(P).values() if isinstance(v, Primitive)]
+    assert set(prims) == {getattr(P, name)
+                          for name in serialize._PRIMITIVE_IDS}
+    assert len(set(serialize._PRIMITIVE_IDS)) == len(prims)
+    # These IDs must never change
+    assert serialize._PRIMITIVE_IDS.index('scalar_add') == 0
+    assert serialize._DTYPE_IDS.index('Int') == 5
+    assert dumps(Int[64]) == b'MYIA\x01\x00\x00\r\x05\t\x01\x05\x04bits' \
+        b'\x03\x80\x01'
+
+
+def test_serialize_errors():
+    def local():
+        pass
+
+    with pytest.raises(SerializationError):
+        dumps(local)
+    with pytest.raises(SerializationError):
+        dumps(object())
+    with pytest.raises(SerializationError):
+        dumps(Constant(1))
+    with pytest.raises(SerializationError):
+        loads(b'NOPE')
+    data = dumps(1)
+    with pytest.raises(SerializationError):
+        loads(data[:4] + b'\x63' + data[5:])
+    with pytest.raises(SerializationError):
+        loads(data[:-1])
+
+
+def test_graph_hash():
+    @parse
+    def f(x, y):
+        def g(z):
+            return z * x
+        return g(y) + x if x > 0 else y
+
+    @parse
+    def f2(a, b):
+        def h(w):
+            return w * a
+        return h(b) + a if a > 0 else b
+
+    @parse
+    def f3(a, b):
+        def h(w):
+            return w * b
+        return h(b) + a if a > 0 else b
+
+    h = graph_hash(f)
+    assert graph_hash(f2) == h
+    assert graph_hash(f3) != h
+    assert graph_hash(clone(f)) == h
+    assert graph_hash(_roundtrip(f)) == h
+
+    # Graphs that are opaque are compared by identity
+    def opaque(g):
+        return g not in (f, f2)
+
+    assert graph_hash(f, opaque=opaque) == graph_hash(f, opaque=opaque)
+    assert graph_hash(f, opaque=opaque) != graph_hash(f2, opaque=opaque)
+
+
+def test_graph_hash_properties():
+    def make(t):
+        g = Graph()
+        p = g.add_parameter()
+        p.type = t
+        g.output = p
+        return g
+
+    g1 = make(Int[64])
+    g2 = make(Float[64])
+    assert graph_hash(g1) != graph_hash(g2)
+    assert graph_hash(g1) == graph_hash(make(Int[64]))
+    assert graph_hash(g1, properties=()) == graph_hash(g2, properties=())
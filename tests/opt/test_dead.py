@@ -0,0 +1,115 @@
+
+from myia.api import standard_debug_pipeline
+from myia.dtype import Int
+from myia.ir import manage
+from myia.opt import elim_unused_parameters
+from myia.prim.py_implementations import partial, scalar_add
+
+from .test_opt import _check_transform
+
+
+def _elim(g):
+    elim_unused_parameters(g, manage(g))
+
+
+def test_elim_unused_parameters():
+
+    def helper_before(a, b, c):
+        return a * c
+
+    def before(x, y):
+        return helper_before(x, y, 3) + helper_before(y, x, 4)
+
+    def helper_after(a, c):
+        return a * c
+
+    def after(x, y):
+        return helper_after(x, 3) + helper_after(y, 4)
+
+    _check_transform(before, after, _elim)
+
+
+def test_elim_unused_parameters_cascade():
+
+    def g_before(a, b):
+        return a
+
+    def f_before(a, b):
+        return g_before(a, b)
+
+    def before(x, y):
+        return f_before(x, y)
+
+    def g_after(a):
+        return a
+
+    def f_after(a):
+        return g_after(a)
+
+    def after(x, y):
+        return f_after(x)
+
+    _check_transform(before, after, _elim)
+
+
+def test_elim_unused_parameters_partial():
+
+    def helper_before(a, b, c):
+        return a + c
+
+    def before(x, y):
+        return partial(helper_before, x, y)(4)
+
+    def helper_after(a, c):
+        return a + c
+
+    def after(x, y):
+        return partial(helper_after, x)(4)
+
+    _check_transform(before, after, _elim)
+
+    def helper2(a, b, c):
+        return a + b
+
+    def before2(x, y):
+        # The unused parameter is not given to partial
+        return partial(helper2, x, y)(4)
+
+    _check_transform(before2, before2, _elim)
+
+
+def test_elim_unused_parameters_escape():
+
+    def helper(a, b):
+        return a
+
+    def apply(f, x):
+        return f(x, x)
+
+    def before(x, y):
+        return apply(helper, x)
+
+    def after(x, y):
+        return apply(helper, x)
+
+    _check_transform(before, after, _elim)
+
+
+def test_elim_unused_parameters_pipeline():
+
+    def f(x, y):
+        def g(a, b):
+            return scalar_add(a, x)
+        return g(y, x) + g(x, x)
+
+    pip = standard_debug_pipeline \
+        .select('parse', 'infer', 'specialize', 'prepare', 'opt',
+                'validate', 'cconv', 'export') \
+        .configure({'opt.opts': []}) \
+        .make()
+    res = pip(input=f, argspec=({'type': Int[64]}, {'type': Int[64]}))
+    assert res['output'](1, 2) == f(1, 2)
+    root = res['graph']
+    # After closure conversion, g takes x as a free variable, a and b,
+    # but b is removed.
+    assert max(len(g.parameters) for g in manage(root).graphs) == 2
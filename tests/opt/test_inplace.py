@@ -0,0 +1,86 @@
+
+import numpy
+
+from myia.api import standard_debug_pipeline
+from myia.dtype import Array, Float
+from myia.prim import ops as P
+from myia.prim.py_implementations import array_reduce, dot, scalar_add, \
+    shape
+
+from .test_lib import _count_prim
+
+
+def _compile(f):
+    pip = standard_debug_pipeline \
+        .select('parse', 'infer', 'specialize', 'prepare', 'opt',
+                'validate', 'export') \
+        .make()
+    spec = {'type': Array[Float[64]], 'shape': (3, 3)}
+    return pip(input=f, argspec=(spec, spec))
+
+
+def test_mark_inplace():
+
+    def f(x, y):
+        return dot(x, y) + y
+
+    res = _compile(f)
+    assert _count_prim(res['graph'], P.array_map_into) == 1
+    x, y = numpy.random.rand(2, 3, 3)
+    assert numpy.allclose(res['output'](x, y), x @ y + y)
+
+
+def test_mark_inplace_parameters():
+
+    def f(x, y):
+        return x * y + y
+
+    # The buffers of the parameters belong to the caller
+    res = _compile(f)
+    assert _count_prim(res['graph'], P.array_map_into) == 0
+    x, y = numpy.random.rand(2, 3, 3)
+    x2, y2 = x.copy(), y.copy()
+    assert numpy.allclose(res['output'](x, y), x * y + y)
+    assert (x == x2).all() and (y == y2).all()
+
+
+def test_mark_inplace_live():
+
+    def f(x, y):
+        a = dot(x, y)
+        return a + y, a
+
+    res = _compile(f)
+    assert _count_prim(res['graph'], P.array_map_into) == 0
+    x, y = numpy.random.rand(2, 3, 3)
+    b, a = res['output'](x, y)
+    assert numpy.allclose(a, x @ y)
+    assert numpy.allclose(b, x @ y + y)
+
+
+def test_mark_inplace_read_before():
+
+    def f(x, y):
+        a = dot(x, y)
+        b = dot(a, y)
+        return a + b
+
+    res = _compile(f)
+    assert _count_prim(res['graph'], P.array_map_into) == 1
+    x, y = numpy.random.rand(2, 3, 3)
+    assert numpy.allclose(res['output'](x, y), x @ y + x @ y @ y)
+
+
+def test_mark_inplace_reduce_nothing():
+
+    def f(x, y):
+        a = dot(x, y)
+        b = array_reduce(scalar_add, a, shape(x))
+        return b, a + b
+
+    # array_reduce to the same shape must not return a view on a
+    res = _compile(f)
+    x, y = numpy.random.rand(2, 3, 3)
+    b, c = res['output'](x, y)
+    assert numpy.allclose(b, x @ y)
+    assert numpy.allclose(c, 2 * (x @ y))
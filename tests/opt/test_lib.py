@@ -1,10 +1,17 @@
 
+import numpy
 from pytest import mark
 
-from .test_opt import _check_opt
-from myia.opt import lib
+from .test_opt import _check_opt, parse
+from myia.api import standard_debug_pipeline
+from myia.dtype import Array, Bool, Float
+from myia.infer import ANYTHING
+from myia.ir import Graph
+from myia.opt import lib, PatternEquilibriumOptimizer
+from myia.prim import ops as P
 from myia.prim.py_implementations import \
-    tail, tuple_setitem, scalar_add, scalar_mul, identity, partial
+    tail, tuple_setitem, scalar_add, scalar_mul, identity, partial, \
+    array_map, scalar_exp, scalar_usub, switch
 
 
 #######################
@@ -187,6 +194,56 @@ def test_elim_identity():
     _check_opt(before, after, lib.elim_identity)
 
 
+####################
+# Constant folding #
+####################
+
+
+def test_constant_fold():
+
+    def before(x):
+        return x + 2 * 3 - (4 < 5, 6)[1]
+
+    def after(x):
+        return x + 6 - 6
+
+    _check_opt(before, after,
+               lib.constant_fold,
+               lib.getitem_tuple)
+
+    def before2(x):
+        return x, (2 > 1, (1, 2 + 3))
+
+    g = parse(before2)
+    PatternEquilibriumOptimizer(lib.constant_fold)(g)
+    tup = g.output.inputs[2]
+    assert tup.is_constant() and tup.value == (True, (1, 5))
+
+
+def test_constant_fold_noopt():
+
+    def before(x):
+        return (x * 2 + 1, 1 / 0, partial(scalar_add, 1))
+
+    _check_opt(before, before,
+               lib.constant_fold)
+
+
+def test_constant_fold_shape():
+    g = Graph()
+    x = g.add_parameter()
+    y = g.add_parameter()
+    x.inferred['shape'] = (2, 3)
+    y.inferred['shape'] = (2, ANYTHING)
+    g.output = g.apply(P.make_tuple,
+                       g.apply(P.shape, x),
+                       g.apply(P.shape, y))
+    PatternEquilibriumOptimizer(lib.constant_fold_shape)(g)
+    shpx, shpy = g.output.inputs[1:]
+    assert shpx.is_constant() and shpx.value == (2, 3)
+    assert shpy.is_apply()
+
+
 ######################
 # Branch elimination #
 ######################
@@ -246,6 +303,95 @@ def test_partials():
                lib.simplify_partial)
 
 
+#######################
+# Array optimizations #
+#######################
+
+
+def _count_prim(g, prim):
+    return sum(1 for node in g.manager.all_nodes
+               if node.is_apply() and node.inputs[0].is_constant()
+               and node.inputs[0].value is prim)
+
+
+def test_elim_distribute():
+    g = Graph()
+    x = g.add_parameter()
+    x.inferred['shape'] = (2, 3)
+    g.output = g.apply(P.make_tuple,
+                       g.apply(P.distribute, x, (2, 3)),
+                       g.apply(P.distribute, x, (4, 2, 3)))
+    PatternEquilibriumOptimizer(lib.elim_distribute)(g)
+    a, b = g.output.inputs[1:]
+    assert a is x
+    assert b.is_apply()
+
+
+def test_fuse_array_map():
+
+    def before(x, y, z):
+        return array_map(scalar_add,
+                         array_map(scalar_mul, array_map(scalar_exp, x), y),
+                         z)
+
+    g = parse(before)
+    PatternEquilibriumOptimizer(lib.fuse_array_map)(g)
+    assert _count_prim(g, P.array_map) == 1
+    fn = g.output.inputs[1]
+    assert fn.is_constant_graph()
+    assert len(fn.value.parameters) == 3
+
+
+def test_fuse_array_map_noopt():
+
+    def before(x, y):
+        a = array_map(scalar_exp, x)
+        return array_map(scalar_add, a, y), a
+
+    g = parse(before)
+    PatternEquilibriumOptimizer(lib.fuse_array_map)(g)
+    assert _count_prim(g, P.array_map) == 2
+
+
+def test_fuse_array_map_nonconstant():
+
+    def before(c, x, y):
+        fn = switch(c, scalar_usub, scalar_exp)
+        return (array_map(fn, array_map(scalar_exp, x)),
+                array_map(scalar_exp, array_map(fn, y)))
+
+    g = parse(before)
+    PatternEquilibriumOptimizer(lib.fuse_array_map)(g)
+    assert _count_prim(g, P.array_map) == 4
+
+    pip = standard_debug_pipeline \
+        .select('parse', 'infer', 'specialize', 'prepare', 'opt',
+                'validate', 'export') \
+        .make()
+    spec = {'type': Array[Float[64]], 'shape': (3, 4)}
+    res = pip(input=before, argspec=({'type': Bool}, spec, spec))
+    x, y = numpy.random.rand(2, 3, 4)
+    a, b = res['output'](True, x, y)
+    assert numpy.allclose(a, -numpy.exp(x))
+    assert numpy.allclose(b, numpy.exp(-y))
+
+
+def test_fuse_array_map_pipeline():
+
+    def f(x, y, z):
+        return array_map(scalar_exp, x) * y + z
+
+    pip = standard_debug_pipeline \
+        .select('parse', 'infer', 'specialize', 'prepare', 'opt',
+                'validate', 'export') \
+        .make()
+    spec = {'type': Array[Float[64]], 'shape': (3, 4)}
+    res = pip(input=f, argspec=(spec, spec, spec))
+    assert _count_prim(res['graph'], P.array_map) == 1
+    x, y, z = numpy.random.rand(3, 3, 4)
+    assert numpy.allclose(res['output'](x, y, z), numpy.exp(x) * y + z)
+
+
 ############
 # Inlining #
 ############
@@ -505,6 +651,65 @@ def test_inline_unique_uses_recursive():
                lib.inline_unique_uses)
 
 
+def test_inline_cost():
+
+    def one(x):
+        return x * x
+
+    def two(x):
+        return x + x
+
+    def before(x):
+        return one(x), two(x), two(x)
+
+    def after(x):
+        return x * x, x + x, x + x
+
+    _check_opt(before, after,
+               lib.inline_cost)
+
+
+def test_inline_cost_budget():
+
+    def big(x, y):
+        return (x * y + x) * (y - x) * (x + y * y) * y
+
+    def before(x):
+        return big(x, x) + big(x, x) + big(x, 2) + big(x, 3)
+
+    _check_opt(before, before,
+               lib.make_inliner(lib.make_cost_criterion(max_growth=10),
+                                check_recursive=True))
+
+    _check_opt(before, before,
+               lib.make_inliner(lib.make_cost_criterion(max_growth=15,
+                                                        constant_bonus=0),
+                                check_recursive=True))
+
+    # Constant arguments make inlining more worthwhile, and once some
+    # calls are inlined, inlining the others costs less.
+    g = parse(before)
+    PatternEquilibriumOptimizer(
+        lib.make_inliner(lib.make_cost_criterion(max_growth=15,
+                                                 constant_bonus=10),
+                         check_recursive=True)
+    )(g)
+    assert not any(node.is_constant_graph() for node in g.manager.all_nodes)
+    assert len(g.manager.graphs) == 1
+
+
+def test_inline_cost_recursive():
+
+    def helper(x):
+        return before(x)
+
+    def before(x):
+        return helper(x)
+
+    _check_opt(before, before,
+               lib.inline_cost)
+
+
 def test_replace_applicator():
 
     def app1(x, y):
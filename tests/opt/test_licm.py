@@ -0,0 +1,113 @@
+
+import numpy
+
+from myia.api import standard_debug_pipeline
+from myia.dtype import Array, Int
+from myia.ir import manage
+from myia.prim import ops as P
+
+
+def _run(f, argspec=({'type': Int[64]}, {'type': Int[64]})):
+    pip = standard_debug_pipeline \
+        .select('parse', 'infer', 'specialize', 'prepare', 'opt',
+                'validate', 'export') \
+        .make()
+    res = pip(input=f, argspec=argspec)
+    return res['graph'], res['output']
+
+
+def _graphs_with(root, prim):
+    mng = manage(root)
+    return {g for g in mng.graphs
+            for node in mng.nodes[g]
+            if node.is_apply() and node.inputs[0].is_constant()
+            and node.inputs[0].value is prim}
+
+
+def test_hoist_invariants():
+
+    def f(x, n):
+        i = 0
+        acc = 0
+        while i < n:
+            acc = acc + x * 2
+            i = i + 1
+        return acc
+
+    root, fn = _run(f)
+    assert _graphs_with(root, P.scalar_mul) == {root}
+    assert fn(3, 4) == f(3, 4)
+    assert fn(3, 0) == f(3, 0)
+
+
+def test_hoist_invariants_variant():
+
+    def f(x, n):
+        i = 0
+        while i < n:
+            x = x * 2
+            i = i + 1
+        return x
+
+    root, fn = _run(f)
+    assert root not in _graphs_with(root, P.scalar_mul)
+    assert fn(3, 4) == f(3, 4)
+
+
+def test_hoist_invariants_unsafe():
+
+    def f(x, n):
+        i = 0
+        acc = 0
+        while i < n:
+            acc = acc + n / x
+            i = i + 1
+        return acc
+
+    # Moving the division out of the loop could fail when x == 0
+    root, fn = _run(f)
+    assert root not in _graphs_with(root, P.scalar_div)
+    assert fn(0, 0) == f(0, 0)
+
+
+def test_hoist_invariants_unsafe_arrays():
+
+    def f(x, y, n):
+        i = 0
+        acc = x
+        while i < n:
+            acc = x ** y
+            i = i + 1
+        return acc
+
+    # Integers to negative powers raise an error, so x ** y must stay in
+    # the loop, which does not run when n == 0
+    spec = {'type': Array[Int[64]], 'shape': (3,)}
+    root, fn = _run(f, (spec, spec, {'type': Int[64]}))
+    assert root not in _graphs_with(root, P.array_map)
+    x = numpy.zeros(3, dtype='int64')
+    y = -numpy.ones(3, dtype='int64')
+    assert (fn(x, y, 0) == x).all()
+
+
+def test_hoist_invariants_nested():
+
+    def f(x, n):
+        i = 0
+        acc = 0
+        while i < n:
+            j = 0
+            while j < n:
+                acc = acc + x * 3
+                j = j + 1
+            i = i + 1
+        return acc
+
+    # x * 3 is moved out of the inner loop, into the body of the outer loop
+    root, fn = _run(f)
+    mng = manage(root)
+    body, = _graphs_with(root, P.scalar_mul)
+    inner, = [node.inputs[0].value for node in mng.nodes[body]
+              if node.is_apply() and node.inputs[0].is_constant_graph()]
+    assert body not in mng.scopes[inner]
+    assert fn(2, 3) == f(2, 3)
@@ -3,13 +3,14 @@ import pytest
 
 from myia import operations
 from myia.api import scalar_pipeline
-from myia.ir import Constant, isomorphic, GraphCloner
+from myia.ir import Apply, Constant, Graph, isomorphic, GraphCloner, \
+    manage
 from myia.opt import PatternSubstitutionOptimization as psub, \
     PatternEquilibriumOptimizer, pattern_replacer, sexp_to_graph, \
     cse
 from myia.prim import Primitive, ops as prim
 from myia.utils import Merge
-from myia.utils.unify import Var, var
+from myia.utils.unify import SVar, Var, var
 
 X = Var('X')
 V = var(lambda n: n.is_constant())
@@ -291,6 +292,26 @@ def test_constant_variable():
                Qct_to_P)
 
 
+def test_replacement_keeps_shape():
+    # The matched nodes are rebuilt in the replacement, and must keep
+    # their inferred properties.
+    g = Graph()
+    x = g.add_parameter()
+    a = g.apply(prim.scalar_add, x, x)
+    a.type = 'T'
+    a.inferred['shape'] = (2, 3)
+    g.output = g.apply(Q, g.apply(P, a))
+    manage(g)
+    PatternEquilibriumOptimizer(QP_to_QR)(g)
+
+    r = g.output.inputs[1]
+    assert r.inputs[0].value is R
+    a2 = r.inputs[1]
+    assert a2.inputs[0].value is prim.scalar_add
+    assert a2.type == 'T'
+    assert a2.inferred['shape'] == (2, 3)
+
+
 def test_cse():
 
     def helper(fn, before, after):
@@ -316,3 +337,52 @@ def test_cse():
         return d
 
     helper(f2, 12, 8)
+
+
+def test_worklist():
+    def before(x):
+        return P(P(P(P(R(x)))))
+
+    def after(x):
+        return P(x)
+
+    visits = []
+
+    def count_visits(optimizer, node):
+        visits.append(node)
+        return None
+
+    g = parse(before)
+    g = GraphCloner(g, total=True)[g]
+    nnodes = len(manage(g, weak=True).all_nodes)
+    eq = PatternEquilibriumOptimizer(count_visits, idempotent_P, elim_R)
+    eq(g)
+    assert isomorphic(g, parse(after))
+    # Nodes far from a replacement are only visited once
+    assert len(visits) < 2 * nnodes
+
+
+def test_index():
+    def before(x):
+        return Q(P(R(x)), x)
+
+    anything = psub(X, X, name='anything')
+    G = var(lambda n: n.is_constant_graph())
+    Xs = SVar(Var())
+
+    g = parse(before)
+    eq = PatternEquilibriumOptimizer(idempotent_P, elim_R, QP_to_QR,
+                                     anything)
+    assert elim_R.interest == (R,)
+    assert anything.interest is None
+    out = g.output
+    assert eq.candidates(out) == [QP_to_QR, anything]
+    assert eq.candidates(out.inputs[1]) == [idempotent_P, anything]
+    assert eq.candidates(out.inputs[2]) == [anything]
+
+    inl = pattern_replacer(G, Xs, interest=Graph)(
+        lambda opt, node, equiv: node
+    )
+    assert inl.interest == (Graph,)
+    eq = PatternEquilibriumOptimizer(elim_R, inl)
+    assert eq.candidates(Apply([Constant(g), out], g)) == [inl]
@@ -4,12 +4,15 @@ from types import SimpleNamespace
 import numpy as np
 import math
 
-from myia.dtype import Int, Float, List, Tuple, External
+from myia.dtype import Bool, Int, Float, List, Tuple, External
 from myia.prim.py_implementations import setattr as myia_setattr, \
     tuple_setitem, list_setitem, tail, hastype, typeof, \
-    shape, reshape, array_map, array_scan, array_reduce, \
+    shape, reshape, array_map, array_map_into, array_scan, array_reduce, \
     distribute, dot, partial as myia_partial, identity, _assert_scalar, \
-    switch, scalar_to_array, broadcast_shape, scalar_cast
+    switch, scalar_to_array, broadcast_shape, scalar_cast, scalar_add, \
+    scalar_lt, vm_implementations, _graph_kernel
+from myia.ir import Graph
+from myia.prim import ops as P
 
 from ..test_lang import parse_compare
 
@@ -206,6 +209,109 @@ def test_prim_array_map2():
     assert (vres == 2).all()
 
 
+def test_prim_array_map_ufunc():
+    v1 = np.arange(6, dtype='int64').reshape((2, 3))
+    v2 = np.ones((2, 3), dtype='int64')
+
+    vres = array_map(scalar_add, v1, v2)
+    assert vres.dtype == np.int64
+    assert (vres == v1 + 1).all()
+
+    vres = array_map(scalar_lt, v1, v2)
+    assert (vres == (v1 < 1)).all()
+
+
+def test_prim_array_map_graph_kernel():
+    g = Graph()
+    x = g.add_parameter()
+    y = g.add_parameter()
+    g.output = g.apply(P.scalar_add, g.apply(P.scalar_mul, x, 2), y)
+    assert _graph_kernel(g) is not None
+
+    v1 = np.arange(6, dtype='float64').reshape((2, 3))
+    v2 = np.ones((2, 3))
+    vres = vm_implementations[P.array_map](None, g, v1, v2)
+    assert (vres == v1 * 2 + v2).all()
+
+    g2 = Graph()
+    x = g2.add_parameter()
+    g2.output = g2.apply(P.switch, g2.apply(P.scalar_lt, x, 2), x, 0)
+    assert _graph_kernel(g2) is None
+
+    g3 = Graph()
+    x = g3.add_parameter()
+    g3.output = g3.apply(g, x, x)
+    assert _graph_kernel(g3) is not None
+
+    g4 = Graph()
+    g4.output = g4.add_parameter()
+    assert _graph_kernel(g4) is None
+
+
+def test_prim_array_map_graph_kernel_reuse():
+    g = Graph()
+    x, y, z = g.add_parameter(), g.add_parameter(), g.add_parameter()
+    ex = g.apply(P.scalar_exp, x)
+    ex.type = Float[64]
+    exy = g.apply(P.scalar_mul, ex, y)
+    exy.type = Float[64]
+    g.output = g.apply(P.scalar_add, exy, z)
+    g.output.type = Float[64]
+
+    v1, v2, v3 = np.random.rand(3, 2, 3)
+    vres = _graph_kernel(g)(v1, v2, v3)
+    assert np.allclose(vres, np.exp(v1) * v2 + v3)
+    out = np.zeros((2, 3))
+    assert _graph_kernel(g)(v1, v2, v3, out=out) is out
+    assert np.allclose(out, vres)
+    # The intermediates are not overwritten if they must be broadcast
+    vres = _graph_kernel(g)(np.zeros(3), v2, v3)
+    assert np.allclose(vres, v2 + v3)
+
+    # Nor if their type is different
+    g2 = Graph()
+    x, y = g2.add_parameter(), g2.add_parameter()
+    ex = g2.apply(P.scalar_exp, x)
+    ex.type = Float[64]
+    g2.output = g2.apply(P.scalar_lt, ex, y)
+    g2.output.type = Bool
+    vres = _graph_kernel(g2)(v1, v2)
+    assert vres.dtype == np.bool_
+    assert (vres == (np.exp(v1) < v2)).all()
+
+
+def test_prim_array_map_into():
+    v1 = np.arange(6, dtype='float64').reshape((2, 3))
+    v2 = np.ones((2, 3))
+    out = np.zeros((2, 3))
+
+    vres = array_map_into(out, scalar_add, v1, v2)
+    assert vres is out
+    assert (vres == v1 + 1).all()
+
+    vres = array_map_into(v1, scalar_add, v1, v2)
+    assert vres is v1
+    assert (v1 == np.arange(6).reshape((2, 3)) + 1).all()
+
+    # A read-only buffer is not overwritten
+    ro = np.broadcast_to(np.zeros(3), (2, 3))
+    vres = array_map_into(ro, scalar_add, v1, v2)
+    assert vres is not ro
+    assert (ro == 0).all()
+
+    g = Graph()
+    x = g.add_parameter()
+    y = g.add_parameter()
+    g.output = g.apply(P.scalar_add, g.apply(P.scalar_mul, x, 2), y)
+    impl = vm_implementations[P.array_map_into]
+    v1 = np.arange(6, dtype='float64').reshape((2, 3))
+    vres = impl(None, v1, g, v1, v2)
+    assert vres is v1
+    assert (vres == np.arange(6).reshape((2, 3)) * 2 + 1).all()
+    vres = impl(None, v1, P.scalar_mul, v1, v2)
+    assert vres is v1
+
+
 def test_prim_array_scan():
     v = np.ones((2, 3))
 
@@ -219,6 +325,26 @@ def test_prim_array_scan():
     assert (v2 == vref).all()
 
 
+def test_prim_array_scan_native():
+    v = np.arange(12, dtype='int64').reshape((3, 4)) % 5 - 2
+
+    def add(a, b):
+        return a + b
+
+    for axis in (0, 1):
+        res = array_scan(scalar_add, 3, v, axis)
+        assert res.dtype == np.int64
+        assert (res == array_scan(add, 3, v, axis)).all()
+        assert (res == np.cumsum(v, axis=axis) + 3).all()
+
+    g = Graph()
+    x = g.add_parameter()
+    y = g.add_parameter()
+    g.output = g.apply(P.switch, g.apply(P.scalar_gt, x, y), x, y)
+    res = vm_implementations[P.array_scan](None, g, -1, v, 1)
+    assert (res == np.maximum(np.maximum.accumulate(v, axis=1), -1)).all()
+
+
 def test_prim_array_reduce():
     def add(a, b):
         return a + b
@@ -231,6 +357,7 @@ def test_prim_array_reduce():
         (add, (2, 3, 7), (1, 1, 1), 42),
         (add, (2, 3, 7), (), 42),
     ]
+    tests += [(scalar_add, *rest) for _, *rest in tests]
 
     for f, inshp, outshp, value in tests:
         v = np.ones(inshp)
@@ -247,6 +374,38 @@ def test_prim_array_reduce():
         assert (res == value).all()
 
 
+def test_prim_array_reduce_native():
+    v = np.arange(24, dtype='int64').reshape((2, 3, 4)) - 10
+    res = array_reduce(scalar_add, v, (3, 1))
+    assert res.dtype == np.int64
+    assert (res == v.sum(axis=(0, 2)).reshape((3, 1))).all()
+
+    vm_reduce = vm_implementations[P.array_reduce]
+    res = vm_reduce(None, P.scalar_mul, v + 11, (1, 1, 4))
+    assert (res == (v + 11).prod(axis=(0, 1), keepdims=True)).all()
+
+    for cmp, first, expected in [(P.scalar_gt, 0, v.max()),
+                                 (P.scalar_ge, 1, v.min()),
+                                 (P.scalar_lt, 0, v.min()),
+                                 (P.scalar_le, 1, v.max())]:
+        g = Graph()
+        x = g.add_parameter()
+        y = g.add_parameter()
+        a, b = (x, y) if first == 0 else (y, x)
+        g.output = g.apply(P.switch, g.apply(cmp, x, y), a, b)
+        res = vm_reduce(None, g, v, ())
+        assert res.dtype == np.int64
+        assert res == expected
+
+
+def test_prim_array_reduce_fresh():
+    v = np.ones((2, 3))
+    for f in (scalar_add, lambda a, b: a + b):
+        res = array_reduce(f, v, (2, 3))
+        assert not np.shares_memory(res, v)
+        assert (res == v).all()
+
+
 def test_prim_distribute():
     assert (distribute(1, (2, 3)) == np.ones((2, 3))).all()
 
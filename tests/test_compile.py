@@ -1,10 +1,15 @@
 from pytest import mark
 from copy import copy
+import numpy as np
 
 from myia.api import standard_pipeline
+from myia.compile.debug_lin import debug_convert
+from myia.compile.memory import MemoryPlan, plan_memory
+from myia.dtype import Array, Float
+from myia.ir import toposort
 from myia.prim import ops as P
 from myia.prim.py_implementations import \
-    typeof, scalar_add, partial
+    typeof, scalar_add, partial, dot, array_reduce, shape
 
 compile_pipeline = standard_pipeline
 
@@ -139,3 +144,71 @@ def test_if_nontail():
     for test in [(6, 23, 23**2), (67, 23, 67**2)]:
         *args, expected = test
         assert myia_fn(*args) == expected
+
+
+def test_plan_memory():
+    def f(x, y):
+        a = x * y
+        c = dot(a, x)
+        d = c * y
+        return dot(d, c)
+
+    spec = {'type': Array[Float[64]], 'shape': (3, 3)}
+    res = compile_pipeline.run(input=f, argspec=(spec, spec))
+    g = res['graph']
+    lst = [node for node in toposort(g.return_)
+           if node.is_apply() and node is not g.return_]
+    plan = plan_memory(lst, g.manager.uses)
+    # a is dead when d is computed, so they use the same memory
+    assert len(plan.slots) == 2
+    assert [offset for offset, *_ in plan.slots.values()] == [0, 0]
+    assert plan.size == 3 * 3 * 8
+
+    x, y = np.random.rand(2, 3, 3)
+    for _ in range(2):
+        assert np.allclose(res['output'](x, y), f(x, y))
+
+
+def test_plan_memory_calls():
+    def f(x, y):
+        a = x * y
+        return array_reduce(scalar_add, a, shape(x))
+
+    spec = {'type': Array[Float[64]], 'shape': (3,)}
+    fn = compile_pipeline.run(input=f, argspec=(spec, spec))['output']
+    x = np.ones(3)
+    r1 = fn(x, x)
+    r2 = fn(5 * x, x)
+    assert (r1 == x).all()
+    assert (r2 == 5 * x).all()
+
+
+def test_plan_memory_per_call(monkeypatch):
+    def f(x, y):
+        return dot(x * y, x)
+
+    spec = {'type': Array[Float[64]], 'shape': (3, 3)}
+    g = compile_pipeline.run(input=f, argspec=(spec, spec))['graph']
+    lst = [node for node in toposort(g.return_)
+           if node.is_apply() and node is not g.return_]
+    fn, inputs, outputs = debug_convert(lst)
+
+    buffers = []
+    allocate = MemoryPlan.allocate
+
+    def spy(plan):
+        views = allocate(plan)
+        buffers.extend(views.values())
+        return views
+
+    # The buffer is allocated on each call, so that the results of a call
+    # never depend on the next one
+    monkeypatch.setattr(MemoryPlan, 'allocate', spy)
+    x, y = np.random.rand(2, 3, 3)
+    args = [x if node is g.parameters[0] else y for node in inputs]
+    r1, = fn(*args)
+    r2, = fn(*args)
+    assert len(buffers) == 2
+    assert not np.shares_memory(buffers[0], buffers[1])
+    assert np.allclose(r1, f(x, y))
+    assert np.allclose(r2, f(x, y))
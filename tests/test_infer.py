@@ -1773,6 +1773,16 @@ def test_hyper_map_nobroadcast(x, y):
     return hyper_map_nobroadcast(scalar_add, x, y)
 
 
+def test_hyper_map_shared_expansions():
+    resources = standard_pipeline.make().resources
+    hm = HyperMap()
+    g1 = hm.specialize(resources, [None, T[i64, i64], T[i64, i64]])
+    g2 = hm.specialize(resources, [None, T[f64, f64], T[f64, f64]])
+    g3 = hm.specialize(resources, [None, T[f64], T[f64]])
+    assert g1 is g2
+    assert g1 is not g3
+
+
 @infer(
     type=[
         (i64, i64, i64),
@@ -1819,3 +1829,54 @@ def test_hyper_add(x, y):
 )
 def test_zeros_like(x):
     return zeros_like(x)
+
+
+def test_incremental_reinference():
+    def f(x, y):
+        a = x * y
+        b = x + y
+        return a, b
+
+    pip = infer_pipeline.configure({'infer.incremental': True}).make()
+    argspec = ({'type': i64}, {'type': i64})
+    res = pip(input=f, argspec=argspec)
+    assert res['inference_results']['type'] == T[i64, i64]
+
+    engine = res['inferrer']
+    g = res['graph']
+    mng = g.manager
+    ctx = res['inference_context']
+    _, a, b = g.output.inputs
+    fut_a = engine.get_inferred('type', engine.ref(a, ctx))
+    fut_out = engine.get_inferred('type', engine.ref(g.output, ctx))
+
+    mng.replace(b, g.apply(P.scalar_lt, *b.inputs[1:]))
+
+    res, _ = engine.run(g, argspec)
+    assert res['type'] == T[i64, B]
+    # Results that do not depend on the modified node are kept
+    assert engine.get_inferred('type', engine.ref(a, ctx)) is fut_a
+    assert engine.get_inferred('type', engine.ref(g.output, ctx)) \
+        is not fut_out
+
+
+def test_incremental_reinference_call():
+    def f(x):
+        def g(y):
+            return y + y
+        return g(x) * x
+
+    pip = infer_pipeline.configure({'infer.incremental': True}).make()
+    argspec = ({'type': i64},)
+    res = pip(input=f, argspec=argspec)
+    assert res['inference_results']['type'] == i64
+
+    engine = res['inferrer']
+    g = res['graph']
+    call = g.output.inputs[1]
+    inner = call.inputs[0].value
+    y, = inner.parameters
+    inner.manager.replace(inner.output, inner.apply(P.scalar_lt, y, y))
+
+    with pytest.raises(InferenceError):
+        engine.run(g, argspec)
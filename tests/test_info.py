@@ -1,4 +1,8 @@
-from myia.info import DebugInfo, DebugInherit, NamedDebugInfo, About
+from myia.api import standard_pipeline
+from myia.dtype import Int
+from myia.info import DebugInfo, DebugInherit, NamedDebugInfo, About, \
+    NO_DEBUG_INFO, debug_info
+from myia.ir import Graph, Parameter
 
 
 def test_nested_info():
@@ -49,3 +53,37 @@ def test_info_find():
     assert b.find('field1') == 1
     assert b.find('field2') == 3
     assert b.find('field3') is None
+
+
+def test_debug_info_disabled():
+    """Test that no debug information is created when it is disabled."""
+    g = Graph()
+    with debug_info(False):
+        assert NamedDebugInfo(name='x') is NO_DEBUG_INFO
+        g2 = Graph()
+        assert g2.debug is NO_DEBUG_INFO
+        g2.debug.name = 'g2'
+        assert g2.debug.name is None
+        with About(g.debug, 'copy'), DebugInherit(save_trace=True):
+            p = Parameter(g2)
+            assert p.debug is NO_DEBUG_INFO
+            assert p.debug.trace is None
+        p.debug.errors.add('error')
+        assert p.debug.errors == set()
+        with debug_info(True):
+            with About(g.debug, 'copy'):
+                p = Parameter(g2)
+            assert p.debug.about.debug is g.debug
+    assert Graph().debug is not NO_DEBUG_INFO
+
+
+def test_debug_info_pipeline():
+    """Test the debug_info resource of pipelines."""
+    def f(x):
+        return x + 1
+
+    pip = standard_pipeline.configure_resources(debug_info=False)
+    res = pip.run(input=f, argspec=({'type': Int[64]},))
+    assert res['graph'].debug is NO_DEBUG_INFO
+    assert res['output'](2) == 3
+    assert NamedDebugInfo() is not NO_DEBUG_INFO
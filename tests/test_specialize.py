@@ -1,15 +1,19 @@
 
 import numpy
+import pytest
 from pytest import mark
 
 from myia.api import scalar_debug_pipeline, standard_debug_pipeline
 from myia.debug.label import short_labeler as lbl
+from myia.ir import Graph, manage
 from myia.prim.py_implementations import \
     hastype, partial, list_map, scalar_add, scalar_sub, \
     scalar_usub, scalar_uadd, switch
+from myia.infer import ANYTHING
+from myia.specialize import TypeSpecializer, SpecializationBudgetError
 from myia.validate import validate, ValidationError
 
-from .common import mysum, i64, f64
+from .common import mysum, i64, f64, ai64
 
 
 specialize_pipeline = scalar_debug_pipeline \
@@ -291,3 +295,129 @@ def test_switch2(c, x, y):
 @specialize((int1, int2, int2))
 def test_multitype(x, y, z):
     return mysum(x) * mysum(x, y) * mysum(x, y, z)
+
+
+def _run_specializer(fn, *argspec, pipeline=scalar_debug_pipeline, **kw):
+    pip = pipeline.select('parse', 'infer').make()
+    res = pip(input=fn, argspec=argspec)
+    spc = TypeSpecializer(res['inferrer'], **kw)
+    g = spc.run(res['graph'], res['inference_context'])
+    return spc, g
+
+
+def test_collapse_equivalent_contexts():
+    def f(x):
+        def helper(a):
+            return a + 1
+        return helper(1) + helper(2) + helper(x)
+
+    spc, g = _run_specializer(f, {'type': i64})
+    counts = {str(orig): n for orig, n in spc.counts.items()}
+    assert counts == {'f': 1, 'helper': 1}
+    assert sum(spc.collapsed.values()) >= 1
+    helpers = {ct.value for node in manage(g).nodes[g]
+               for ct in node.inputs if ct.is_constant(Graph)}
+    assert len(helpers) == 1
+
+
+def _shape_poly(x, y, z):
+    def helper(a):
+        return a * a
+    return helper(x), helper(y), helper(z)
+
+
+def test_specialization_budget():
+    argspec = ({'type': ai64, 'shape': (ANYTHING, ANYTHING)},
+               {'type': ai64, 'shape': (2, 3)},
+               {'type': ai64, 'shape': (4, 5)})
+
+    spc, _ = _run_specializer(_shape_poly, *argspec,
+                              pipeline=standard_debug_pipeline)
+    counts = {str(orig): n for orig, n in spc.counts.items()}
+    assert counts['helper'] == 3
+
+    spc, _ = _run_specializer(_shape_poly, *argspec,
+                              pipeline=standard_debug_pipeline,
+                              max_specializations=1)
+    counts = {str(orig): n for orig, n in spc.counts.items()}
+    broadened = {str(orig): n for orig, n in spc.broadened.items()}
+    assert counts['helper'] <= 2
+    assert counts['helper'] + broadened['helper'] == 3
+    assert 'helper' in spc.report()
+
+    pip = standard_debug_pipeline \
+        .select('parse', 'infer', 'specialize', 'export') \
+        .configure({'specialize.max_specializations': 1}) \
+        .make()
+    res = pip(input=_shape_poly, argspec=argspec)
+    assert sum(res['specializer'].broadened.values()) > 0
+    x = numpy.ones((2, 2), dtype='int64')
+    y = numpy.ones((2, 3), dtype='int64') * 2
+    z = numpy.ones((4, 5), dtype='int64') * 3
+    for a, b in zip(res['output'](x, y, z), _shape_poly(x, y, z)):
+        assert (a == b).all()
+
+
+def test_specialization_budget_exceeded():
+    argspec = ({'type': ai64, 'shape': (3, 3)},
+               {'type': ai64, 'shape': (2, 3)},
+               {'type': ai64, 'shape': (4, 5)})
+
+    with pytest.raises(SpecializationBudgetError):
+        _run_specializer(_shape_poly, *argspec,
+                         pipeline=standard_debug_pipeline,
+                         max_specializations=2)
+
+    with pytest.raises(SpecializationBudgetError):
+        _run_specializer(_shape_poly, *argspec,
+                         pipeline=standard_debug_pipeline,
+                         max_nodes=10)
+
+
+def _pair(a):
+    return a, a
+
+
+def _shape_poly_pairs(x, y, z):
+    return _pair(y), _pair(z), _pair(x)
+
+
+def test_specialization_budget_broadest():
+    argspec = ({'type': ai64, 'shape': (ANYTHING, ANYTHING)},
+               {'type': ai64, 'shape': (2, 3)},
+               {'type': ai64, 'shape': (ANYTHING, 5)})
+
+    # There is only room for one specialization of _pair. The other contexts
+    # reuse the broadest one, which is specialized even though it does not
+    # fit in max_nodes either.
+    spc, _ = _run_specializer(_shape_poly_pairs, *argspec,
+                              pipeline=standard_debug_pipeline,
+                              max_nodes=16)
+    counts = {str(orig): n for orig, n in spc.counts.items()}
+    broadened = {str(orig): n for orig, n in spc.broadened.items()}
+    assert counts['_pair'] + broadened.get('_pair', 0) == 3
+    pairs = {}
+    for ctx, g2 in spc.specializations.items():
+        if str(spc.originals[g2]) == '_pair':
+            shape, = (dict(argkey)['shape'] for argkey in ctx.argkey)
+            pairs[shape] = g2
+    broadest = pairs[(ANYTHING, ANYTHING)]
+    assert sum(g2 is not broadest for g2 in pairs.values()) <= 1
+
+
+def test_merge_identical_specializations():
+    def f(x):
+        def sq1(a):
+            return a * a
+
+        def sq2(b):
+            return b * b
+
+        return sq1(x) + sq2(x)
+
+    spc, g = _run_specializer(f, {'type': i64})
+    merged = {str(orig): n for orig, n in spc.merged.items()}
+    assert sum(merged.values()) == 1
+    helpers = {ct.value for node in manage(g).nodes[g]
+               for ct in node.inputs if ct.is_constant(Graph)}
+    assert len(helpers) == 1